@@ -1,5 +1,21 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+
+def bump_count_generation(sender, **kwargs):
+    from .paginator import bump_generation
+    bump_generation(sender)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Изменение моделей постраничных выборок сбрасывает
+        # кешированные размеры; остальные сохранения не трогают кеш
+        for label in settings.COUNT_CACHE_MODELS:
+            model = apps.get_model(label)
+            post_save.connect(bump_count_generation, sender=model)
+            post_delete.connect(bump_count_generation, sender=model)
+        from . import signals  # noqa: F401
@@ -0,0 +1,89 @@
+# core/cache.py
+"""Кеширование с защитой от одновременного пересчёта (cache stampede).
+
+Значение хранится вместе с логическим сроком годности и
+временем последнего вычисления. До истечения срока значение
+может быть пересчитано заранее с вероятностью, растущей к
+концу срока (алгоритм XFetch), поэтому пересчёт не приходится
+на один момент для всех процессов. Пересчитывает только
+процесс, взявший блокировку в кеше; остальные получают
+устаревшее значение. Если пересчёт упал из-за ошибки базы
+данных, тоже отдаётся устаревшее значение.
+"""
+import logging
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _store(key, compute, timeout, stale_timeout, using):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    using.set(
+        key, (value, time.time() + timeout, delta), timeout + stale_timeout
+    )
+    return value
+
+
+def _should_refresh(expires, delta, beta):
+    # -log(random()) > 0, поэтому пересчёт наступает немного раньше срока
+    early = delta * beta * -math.log(1.0 - random.random())
+    return time.time() + early >= expires
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None,
+                   lock_timeout=None, beta=None, using=None):
+    """Значение из кеша или результат compute() с одним пересчётом.
+
+    timeout - логический срок годности значения, stale_timeout -
+    сколько ещё после него можно отдавать устаревшее значение.
+    """
+    using = using or cache
+    stale_timeout = (
+        settings.CACHE_STALE_TIMEOUT if stale_timeout is None
+        else stale_timeout
+    )
+    lock_timeout = lock_timeout or settings.CACHE_LOCK_TIMEOUT
+    beta = settings.CACHE_EARLY_BETA if beta is None else beta
+    lock_key = _lock_key(key)
+
+    envelope = using.get(key)
+    if envelope is not None:
+        value, expires, delta = envelope
+        if not _should_refresh(expires, delta, beta):
+            return value
+        if not using.add(lock_key, 1, lock_timeout):
+            # Пересчитывает другой процесс
+            return value
+        try:
+            return _store(key, compute, timeout, stale_timeout, using)
+        except DatabaseError:
+            logger.exception('Отдаём устаревшее значение %s', key)
+            return value
+        finally:
+            using.delete(lock_key)
+
+    # Значения нет: ждём процесс, который уже пересчитывает
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while not using.add(lock_key, 1, lock_timeout):
+        if time.monotonic() >= deadline:
+            return compute()
+        time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+        envelope = using.get(key)
+        if envelope is not None:
+            return envelope[0]
+    try:
+        return _store(key, compute, timeout, stale_timeout, using)
+    finally:
+        using.delete(lock_key)
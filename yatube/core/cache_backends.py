@@ -0,0 +1,303 @@
+# core/cache_backends.py
+"""Двухуровневый кеш: локальный LRU процесса перед общим кешем.
+
+Горячие ключи (например, фрагмент первой страницы ленты) читаются
+из памяти процесса без обращения к общему кешу и распаковки.
+Локальные записи живут недолго. Ключи делятся на пространства по
+префиксу до первого двоеточия ('unread:count:1' - 'unread'), если
+префикс перечислен в NAMESPACES; остальные ключи (сессии,
+фрагменты шаблонов, ключи sorl) попадают в одно пространство
+'default', так что число пространств ограничено. Запись через
+бэкенд увеличивает счётчик поколения своего пространства в общем
+кеше. Процесс сверяет счётчики одним
+get_many не чаще раза в CHECK_INTERVAL секунд и сбрасывает
+только записи пространств, в которые писал кто-то другой.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'MAX_ENTRIES': 500,
+                'NAMESPACES': ('unread', 'querycache'),
+            },
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION_KEY = 'two_tier:generation:{}'
+DEFAULT_NAMESPACE = 'default'
+
+# Неизменяемые значения хранятся в локальном уровне как есть,
+# остальные - в виде pickle, чтобы изменение полученного объекта
+# не портило кеш
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+# Локальный уровень общий для всех потоков процесса, как у LocMemCache
+_tiers = {}
+_tiers_lock = Lock()
+
+
+def namespace(key, names):
+    """Пространство ключа: префикс до первого двоеточия из names."""
+    prefix = key.split(':', 1)[0]
+    return prefix if prefix in names else DEFAULT_NAMESPACE
+
+
+def generation_key(name):
+    return GENERATION_KEY.format(name)
+
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+class LocalTier:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        # Поколения пространств, с которыми согласованы записи
+        self.generations = {}
+        self.checked = 0.0
+        self.hits = {'local': 0, 'shared': 0}
+        self.misses = {'local': 0, 'shared': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            value, pickled, expires, _ = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+        return True, pickle.loads(value) if pickled else value
+
+    def set(self, key, value, ttl, name):
+        pickled = not _is_immutable(value)
+        if pickled:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (
+                value, pickled, time.monotonic() + ttl, name
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def drop(self, names):
+        """Удаляет записи пространств names."""
+        with self.lock:
+            stale = [key for key, entry in self.entries.items()
+                     if entry[3] in names]
+            for key in stale:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = {'local': 0, 'shared': 0}
+            self.misses = {'local': 0, 'shared': 0}
+
+    def count(self, tier, hit):
+        with self.lock:
+            (self.hits if hit else self.misses)[tier] += 1
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared = caches[options.get('SHARED', 'shared')]
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._check_interval = options.get('CHECK_INTERVAL', 0.5)
+        self._namespaces = frozenset(options.get('NAMESPACES', ()))
+        with _tiers_lock:
+            self._local = _tiers.setdefault(
+                name, LocalTier(self._max_entries)
+            )
+
+    def _local_key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _local_ttl(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self._shared.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _check_generations(self):
+        """Сбрасывает пространства, в которые писали другие процессы."""
+        now = time.monotonic()
+        if now - self._local.checked < self._check_interval:
+            return
+        self._local.checked = now
+        known = dict(self._local.generations)
+        if not known:
+            return
+        current = self._shared.get_many(
+            [generation_key(name) for name in known]
+        )
+        changed = {}
+        for name, generation in known.items():
+            actual = current.get(generation_key(name))
+            if actual != generation:
+                changed[name] = actual
+        if changed:
+            self._local.drop(changed)
+            self._local.generations.update(changed)
+
+    def _track(self, keys):
+        """Запоминает поколения пространств до чтения их ключей.
+
+        Поколение читается раньше значения: запись, случившаяся
+        между чтениями, будет замечена при следующей сверке.
+        """
+        names = {namespace(key, self._namespaces) for key in keys}
+        names.difference_update(self._local.generations)
+        if not names:
+            return
+        current = self._shared.get_many(
+            [generation_key(name) for name in names]
+        )
+        for name in names:
+            self._local.generations[name] = current.get(generation_key(name))
+
+    def _bump(self, keys):
+        """Увеличивает поколения пространств записанных ключей."""
+        for name in {namespace(key, self._namespaces) for key in keys}:
+            key = generation_key(name)
+            try:
+                generation = self._shared.incr(key)
+            except ValueError:
+                self._shared.add(key, 0, None)
+                generation = self._shared.get(key)
+            known = self._local.generations.get(name)
+            if known is None or generation != known + 1:
+                # Между проверками в пространство писал кто-то ещё
+                self._local.drop({name})
+            self._local.generations[name] = generation
+
+    def _remember(self, key, value, timeout, version):
+        ttl = self._local_ttl(timeout)
+        name = namespace(key, self._namespaces)
+        if ttl > 0 and name in self._local.generations:
+            self._local.set(self._local_key(key, version), value, ttl, name)
+
+    def get(self, key, default=None, version=None):
+        self._check_generations()
+        found, value = self._local.get(self._local_key(key, version))
+        self._local.count('local', found)
+        if found:
+            return value
+        self._track([key])
+        missing = object()
+        value = self._shared.get(key, missing, version=version)
+        self._local.count('shared', value is not missing)
+        if value is missing:
+            return default
+        self._remember(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_generations()
+        result, missing = {}, []
+        for key in keys:
+            found, value = self._local.get(self._local_key(key, version))
+            self._local.count('local', found)
+            if found:
+                result[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            self._track(missing)
+            values = self._shared.get_many(missing, version=version)
+            for key in missing:
+                self._local.count('shared', key in values)
+            for key, value in values.items():
+                self._remember(key, value, DEFAULT_TIMEOUT, version)
+            result.update(values)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout, version=version)
+        self._bump([key])
+        self._remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._shared.set_many(data, timeout, version=version)
+        self._bump(data)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._shared.add(key, value, timeout, version=version)
+        if added:
+            self._bump([key])
+            self._remember(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self._local_key(key, version))
+        self._shared.delete(key, version=version)
+        self._bump([key])
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(self._local_key(key, version))
+        value = self._shared.incr(key, delta, version=version)
+        self._bump([key])
+        return value
+
+    def has_key(self, key, version=None):
+        missing = object()
+        return self.get(key, missing, version=version) is not missing
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+        self._local.checked = time.monotonic()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
+
+    def stats(self):
+        """Число попаданий, промахов и доля попаданий по уровням."""
+        result = {}
+        for tier in ('local', 'shared'):
+            hits = self._local.hits[tier]
+            total = hits + self._local.misses[tier]
+            result[tier] = {
+                'hits': hits,
+                'misses': total - hits,
+                'ratio': hits / total if total else 0.0,
+            }
+        return result
+
+    def reset_stats(self):
+        self._local.reset_stats()
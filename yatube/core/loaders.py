@@ -0,0 +1,58 @@
+# core/loaders.py
+"""Загрузчики шаблонов, сжимающие разметку один раз при загрузке.
+
+Минифицируется исходный текст шаблона, а не ответ: отступы
+и HTML-комментарии шаблонов исчезают без затрат на каждый
+запрос, а пользовательский текст выводится как есть.
+"""
+import re
+
+from django.conf import settings
+from django.template.loaders import app_directories, filesystem
+
+PRESERVE = re.compile(
+    r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.S | re.I
+)
+# Условные комментарии IE оставляем
+COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+WHITESPACE = re.compile(r'\s+')
+
+
+def _collapse(chunk):
+    return WHITESPACE.sub(' ', COMMENT.sub('', chunk))
+
+
+def minify_html(source):
+    """Удаляет комментарии и схлопывает пробелы вне pre/script/style."""
+    parts = []
+    position = 0
+    for match in PRESERVE.finditer(source):
+        parts.append(_collapse(source[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_collapse(source[position:]))
+    return ''.join(parts).strip()
+
+
+def should_minify(template_name):
+    return (
+        settings.HTML_MINIFY
+        and template_name.endswith('.html')
+        and not template_name.startswith(settings.HTML_MINIFY_EXCLUDE)
+    )
+
+
+class MinifyingMixin:
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if should_minify(origin.template_name):
+            return minify_html(contents)
+        return contents
+
+
+class FilesystemLoader(MinifyingMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(MinifyingMixin, app_directories.Loader):
+    pass
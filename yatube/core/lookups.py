@@ -0,0 +1,58 @@
+# core/lookups.py
+"""Кеш поиска объектов по уникальному полю (группа по slug и т.п.).
+
+Отсутствующие объекты тоже кешируются, чтобы частые запросы
+к несуществующим адресам не доходили до базы. Записи
+сбрасываются при сохранении и удалении объекта, в том
+числе для старого значения поля, если оно изменилось.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from django.http import Http404
+
+MISSING = '__missing__'
+
+
+def lookup_key(model, field, value):
+    digest = hashlib.sha1(str(value).encode()).hexdigest()
+    return f'lookup:{model._meta.label_lower}:{field}:{digest}'
+
+
+def get_cached_or_404(model, field, value):
+    """Объект model с field=value из кеша, иначе из базы."""
+    key = lookup_key(model, field, value)
+    obj = cache.get(key)
+    if obj is None:
+        try:
+            obj = model._default_manager.get(**{field: value})
+        except model.DoesNotExist:
+            obj = MISSING
+            cache.set(key, obj, settings.LOOKUP_CACHE_MISSING_TIMEOUT)
+        else:
+            cache.set(key, obj, settings.LOOKUP_CACHE_TIMEOUT)
+    if obj == MISSING:
+        raise Http404(f'{model._meta.object_name} не найден')
+    return obj
+
+
+def register(model, field):
+    """Подключает сброс кеша при изменении объектов model."""
+    attr = f'_lookup_original_{field}'
+
+    def remember(sender, instance, **kwargs):
+        instance.__dict__[attr] = instance.__dict__.get(field)
+
+    def forget(sender, instance, **kwargs):
+        values = {getattr(instance, field), instance.__dict__.get(attr)}
+        cache.delete_many([
+            lookup_key(model, field, value)
+            for value in values if value is not None
+        ])
+        instance.__dict__[attr] = getattr(instance, field)
+
+    post_init.connect(remember, sender=model, weak=False)
+    post_save.connect(forget, sender=model, weak=False)
+    post_delete.connect(forget, sender=model, weak=False)
@@ -0,0 +1,69 @@
+# core/mail.py
+import base64
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .tasks import enqueue_on_commit
+
+
+def serialize(message):
+    """Письмо в виде JSON-аргументов задачи send_email.
+
+    Вложения-файлы передаются в base64; готовые MIME-части
+    в JSON не переносятся, и для них выбрасывается ValueError.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if isinstance(attachment, MIMEBase):
+            raise ValueError(
+                'Очередь писем не переносит MIME-вложения'
+            )
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            [filename, base64.b64encode(content).decode(), mimetype]
+        )
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    }
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Откладывает отправку писем в фоновую очередь.
+
+    Письма отправляет обработчик очереди через бэкенд
+    из настройки TASK_EMAIL_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        # Письмо, которое нельзя поставить в очередь, не теряется
+        # молча: ошибка возникает до постановки остальных
+        queued = [serialize(message) for message in email_messages]
+        for data in queued:
+            enqueue_on_commit(send_email, data)
+        return len(email_messages)
+
+
+def send_email(data):
+    alternatives = data.pop('alternatives')
+    attachments = data.pop('attachments', [])
+    message = EmailMultiAlternatives(**data)
+    for content, mimetype in alternatives:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    connection = get_connection(settings.TASK_EMAIL_BACKEND)
+    connection.send_messages([message])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи фоновой очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None)
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Пауза между опросами пустой очереди в секундах',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options['threads'])
+        self.stdout.write(
+            f'Обработчик {worker.name}: потоков {worker.threads}'
+        )
+        try:
+            processed = worker.run(
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            worker.stopped.set()
+            return
+        self.stdout.write(f'Выполнено задач: {processed}')
@@ -0,0 +1,208 @@
+# core/media.py
+"""Отдача загруженных файлов (MEDIA_ROOT) в production.
+
+Отдаются только файлы из каталогов MEDIA_SERVE_DIRS, которые
+пропустили проверки MEDIA_SERVE_CHECKS (например, картинки удалённых
+постов, ждущие сборки мусора, не отдаются); прав пользователя
+модуль не проверяет. Файл передаётся веб-серверу заголовком
+X-Accel-Redirect (nginx, MEDIA_SERVE_BACKEND = 'nginx') или
+X-Sendfile (Apache/lighttpd, 'sendfile'), и рабочий процесс
+Python не занят передачей. Без веб-сервера файл отдаётся
+FileResponse с поддержкой Range, ETag и условных запросов.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Имена файлов в хранилище по хешу содержимого (posts.storage)
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.[^/]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class RangeFile:
+    """Файл, читаемый только в пределах [start, start + length)."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def make_etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime * 1000):x}"'
+
+
+def parse_range(header, size):
+    """(начало, длина) для одного диапазона, None - весь файл.
+
+    Для недостижимого диапазона выбрасывает ValueError.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500: последние 500 байт
+        length = min(int(last), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or (
+            if_none_match.strip() == '*'
+        )
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+    )
+    return since is not None and int(mtime) <= since
+
+
+def _range_applies(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+def serve_file(request, path, content_type=None, cache_control=None,
+               accel_name=None):
+    """Ответ с файлом path с учётом ETag, Range и MEDIA_SERVE_BACKEND.
+
+    accel_name - имя файла относительно MEDIA_ROOT, которое веб-сервер
+    вправе отдать сам (X-Accel-Redirect или X-Sendfile); без него
+    файл всегда отдаёт Django.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('Файл не найден')
+    etag = make_etag(stat)
+    if content_type is None:
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control or (
+            f'public, max-age={settings.MEDIA_MAX_AGE}'
+        ),
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SERVE_BACKEND == 'nginx' and accel_name:
+        # Range и условные запросы nginx обработает сам
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(accel_name)
+        )
+    elif settings.MEDIA_SERVE_BACKEND == 'sendfile' and accel_name:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _file_response(request, path, stat, etag, content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _file_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(
+            RangeFile(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = (
+            f'bytes {start}-{start + length - 1}/{size}'
+        )
+    response.block_size = settings.MEDIA_BLOCK_SIZE
+    return response
+
+
+def is_served(name):
+    """Лежит ли файл name в отдаваемой части MEDIA_ROOT.
+
+    Это не проверка прав: в каталогах MEDIA_SERVE_DIRS лежат только
+    публичные файлы. Скрытые и временные файлы (незаконченные
+    загрузки) не отдаются.
+    """
+    parts = name.split('/')
+    if any(part.startswith('.') or part.endswith('.tmp') for part in parts):
+        return False
+    return parts[0] in settings.MEDIA_SERVE_DIRS
+
+
+def can_serve(name):
+    """Отдаётся ли файл name: каталог разрешён и проверки пройдены.
+
+    Проверки - функции из MEDIA_SERVE_CHECKS, принимающие имя файла.
+    """
+    return is_served(name) and all(
+        import_string(check)(name) for check in settings.MEDIA_SERVE_CHECKS
+    )
+
+
+def serve(request, path):
+    """Файл из MEDIA_ROOT по адресу MEDIA_URL + path."""
+    if not can_serve(path):
+        raise Http404('Файл не найден')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    cache_control = IMMUTABLE if CONTENT_ADDRESSED.search(path) else None
+    return serve_file(
+        request, full_path, cache_control=cache_control, accel_name=path
+    )
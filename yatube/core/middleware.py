@@ -0,0 +1,194 @@
+# core/middleware.py
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Имена вида style.0123456789ab.css даёт ManifestStaticFilesStorage
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def parse_accept_encoding(header):
+    """{кодировка: q} из заголовка Accept-Encoding."""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def encoding_weight(weights, encoding):
+    """Вес кодировки; 0 - клиент её не принимает."""
+    return weights.get(encoding, weights.get('*', 0.0))
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT без отдельного веб-сервера.
+
+    Учитывает Accept-Encoding и отдаёт заранее сжатые копии,
+    а файлы с хешем в имени помечает как неизменяемые.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(settings.STATIC_URL):
+            response = self.serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request):
+        if not settings.STATIC_ROOT:
+            return None
+        name = request.path[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime,
+            stat.st_size
+        ):
+            return HttpResponseNotModified()
+        content_type, _ = mimetypes.guess_type(path)
+        encoding, path = self.choose_variant(request, path)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream'
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if HASHED_NAME.search(name):
+            response['Cache-Control'] = (
+                'public, max-age=31536000, immutable'
+            )
+        else:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}'
+            )
+        return response
+
+    def choose_variant(self, request, path):
+        """Сжатая копия с наибольшим весом в Accept-Encoding.
+
+        При равных весах действует порядок ENCODINGS: сначала br.
+        """
+        weights = parse_accept_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        chosen, best = (None, path), 0.0
+        for encoding, suffix in ENCODINGS:
+            weight = encoding_weight(weights, encoding)
+            if weight > best and os.path.isfile(path + suffix):
+                chosen, best = (encoding, path + suffix), weight
+        return chosen
+
+
+class GZipCachedMiddleware:
+    """Сжимает HTML-ответы gzip и кеширует результат сжатия.
+
+    Сжатые байты общих страниц хранятся в кеше под хешем
+    содержимого, поэтому одинаковые ответы (например, собранные из
+    кешированных фрагментов) сжимаются один раз. Страницы с
+    CSRF-токеном и зависящие от cookie страницы вошедших
+    пользователей у каждого свои: они сжимаются без кеша, чтобы не
+    засорять его. Как и
+    GZipMiddleware Django, не защищает от BREACH для страниц с
+    секретами в HTML.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(request, response):
+            return response
+        content = response.content
+        if self.is_shared(request, response):
+            compressed = self.compress_cached(content)
+        else:
+            compressed = gzip.compress(content, settings.HTML_GZIP_LEVEL)
+        if len(compressed) >= len(content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def compress_cached(self, content):
+        key = 'gzip:{level}:{digest}'.format(
+            level=settings.HTML_GZIP_LEVEL,
+            digest=hashlib.sha1(content).hexdigest(),
+        )
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = gzip.compress(content, settings.HTML_GZIP_LEVEL)
+            cache.set(key, compressed, settings.HTML_GZIP_CACHE_TIMEOUT)
+        return compressed
+
+    def is_shared(self, request, response):
+        """Ответ одинаков для многих: его сжатие стоит кешировать.
+
+        Страница с Vary: Cookie общая, только если в запросе нет
+        cookie сессии: такую видят все анонимные посетители.
+        """
+        if request.META.get('CSRF_COOKIE_USED'):
+            return False
+        vary = {
+            header.strip().lower()
+            for header in response.get('Vary', '').split(',')
+        }
+        return (
+            'cookie' not in vary
+            or settings.SESSION_COOKIE_NAME not in request.COOKIES
+        )
+
+    def should_compress(self, request, response):
+        return (
+            not response.streaming
+            and response.status_code == 200
+            and not response.has_header('Content-Encoding')
+            and response.get('Content-Type', '').startswith('text/html')
+            and len(response.content) >= settings.HTML_GZIP_MIN_LENGTH
+            and encoding_weight(
+                parse_accept_encoding(
+                    request.META.get('HTTP_ACCEPT_ENCODING', '')
+                ),
+                'gzip',
+            ) > 0
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('channel', models.CharField(db_index=True, max_length=200, verbose_name='Канал')),
+                ('payload', models.TextField(verbose_name='Данные в JSON')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -11,3 +11,61 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class Task(CreatedModel):
+    """Задача фоновой очереди (см. core.tasks)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    arguments = models.TextField('Аргументы в JSON', default='{}')
+    priority = models.IntegerField('Приоритет', default=0)
+    # Ключ дедупликации занят, пока задача не завершена
+    dedup_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=200,
+        unique=True,
+        blank=True,
+        null=True
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Предел попыток', default=5)
+    run_at = models.DateTimeField('Выполнить не раньше')
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', blank=True, null=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at']),
+            # Удаление старых завершённых задач (prune_finished)
+            models.Index(fields=['status', 'finished']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class Notification(CreatedModel):
+    """Сообщение канала pub/sub (см. core.pubsub)."""
+    channel = models.CharField('Канал', max_length=200, db_index=True)
+    payload = models.TextField('Данные в JSON')
+
+    def __str__(self):
+        return f'{self.channel} #{self.pk}'
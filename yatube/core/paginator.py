@@ -0,0 +1,150 @@
+# core/paginator.py
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .tasks import enqueue
+
+
+def estimate_count(queryset):
+    """Быстрая оценка числа строк таблицы без COUNT(*).
+
+    PostgreSQL хранит оценку в статистике планировщика,
+    в остальных базах берём наибольший первичный ключ:
+    это чтение по индексу, дающее оценку сверху.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.using(queryset.db).aggregate(
+        max_pk=Max('pk')
+    )['max_pk'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, оценивающий размер таблицы без фильтров.
+
+    Для отфильтрованных выборок число строк обычно невелико,
+    и считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None or queryset.query.where:
+            return super().count
+        key = f'estimated_count:{queryset.db}:{queryset.model._meta.label}'
+        count = cache.get(key)
+        if count is None:
+            count = estimate_count(queryset)
+            cache.set(key, count, settings.ESTIMATED_COUNT_TIMEOUT)
+        return count
+
+
+def _generation_key(table):
+    return f'count_generation:{table}'
+
+
+def bump_generation(model):
+    """Сбрасывает кешированные размеры выборок модели."""
+    key = _generation_key(model._meta.db_table)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def refresh_count(key, label):
+    """Фоновый пересчёт размера выборки, сохранённой под ключом key."""
+    query = cache.get(f'{key}:query')
+    if query is None:
+        return
+    queryset = apps.get_model(label)._default_manager.all()
+    queryset.query = query
+    cache.set(key, (queryset.count(), time.time()), None)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с кешированным размером выборки.
+
+    Размер хранится в кеше под ключом из SQL-запроса, поколений
+    всех его таблиц (меняются при сохранении и удалении объектов) и
+    наибольшего первичного ключа таблицы (меняется при любой
+    вставке, в том числе bulk_create). Устаревший по времени
+    размер отдаётся сразу, а пересчитывается в фоновой очереди.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None:
+            return super().count
+        model = queryset.model
+        max_pk = model._default_manager.using(queryset.db).aggregate(
+            max_pk=Max('pk')
+        )['max_pk']
+        sql, params = queryset.query.sql_with_params()
+        tables = sorted({
+            join.table_name for join in queryset.query.alias_map.values()
+        })
+        generations = cache.get_many(
+            [_generation_key(table) for table in tables]
+        )
+        source = repr((
+            queryset.db, sql, params, sorted(generations.items()), max_pk
+        ))
+        key = 'count:' + hashlib.sha1(source.encode()).hexdigest()
+        cached = cache.get(key)
+        if cached is None:
+            count = super().count
+            cache.set(key, (count, time.time()), None)
+            return count
+        count, computed = cached
+        if time.time() - computed > settings.COUNT_CACHE_TIMEOUT:
+            cache.set(f'{key}:query', queryset.query, None)
+            enqueue(refresh_count, key, model._meta.label, dedup_key=key)
+        return count
+
+
+def page_window(page, on_each_side=None, on_ends=None):
+    """Номера первых, последних и ближайших к текущей страниц.
+
+    Пропуски обозначены None, поэтому размер навигации
+    не зависит от числа страниц.
+    """
+    if on_each_side is None:
+        on_each_side = settings.PAGINATOR_ON_EACH_SIDE
+    if on_ends is None:
+        on_ends = settings.PAGINATOR_ON_ENDS
+    num_pages = page.paginator.num_pages
+    low = max(page.number - on_each_side, 1)
+    high = min(page.number + on_each_side, num_pages)
+    pages = []
+    if low > on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(None)
+    else:
+        low = 1
+    if high < num_pages - on_ends:
+        pages.extend(range(low, high + 1))
+        pages.append(None)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(low, num_pages + 1))
+    return pages
@@ -0,0 +1,291 @@
+# core/pubsub.py
+"""Публикация событий и их доставка подписчикам (Server-Sent Events).
+
+publish() записывает сообщение в таблицу Notification после
+фиксации транзакции, изменившей данные: откат отменяет и событие.
+Процессы видят сообщения друг друга через эту таблицу. В каждом
+процессе один поток Hub читает новые строки раз в
+PUBSUB_POLL_INTERVAL секунд и раскладывает их по очередям
+подписчиков, так что число открытых потоков событий не
+умножает число запросов к базе. Номера строк выдаются до
+фиксации, поэтому опрос повторно просматривает PUBSUB_LOOKBACK
+номеров за последним прочитанным и доставляет опоздавшие строки.
+
+    publish(f'author:{post.author_id}', {'id': post.pk, ...})
+    return stream(request, ['author:1', 'author:2'], 'post')
+
+Клиент, переподключаясь с Last-Event-ID, получает пропущенные
+сообщения, если они моложе PUBSUB_RETENTION.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', 'id channel payload')
+
+
+def publish(channel, data):
+    """Публикует сообщение data (JSON) в канал channel.
+
+    Сообщение записывается после фиксации текущей транзакции.
+    """
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    transaction.on_commit(
+        lambda: Notification.objects.create(channel=channel, payload=payload)
+    )
+
+
+def _events(queryset, limit=None):
+    rows = queryset.order_by('pk').values_list('pk', 'channel', 'payload')
+    return [Event(*row) for row in rows[:limit]]
+
+
+def prune():
+    """Удаляет сообщения старше PUBSUB_RETENTION."""
+    border = timezone.now() - timedelta(seconds=settings.PUBSUB_RETENTION)
+    return Notification.objects.filter(created__lt=border).delete()[0]
+
+
+class Subscription:
+    """Очередь сообщений одного подписчика."""
+
+    def __init__(self, hub, channels):
+        self.hub = hub
+        self.channels = set(channels)
+        self.queue = queue.Queue(settings.PUBSUB_QUEUE_SIZE)
+        # Подписчик не успевал разбирать очередь и потерял сообщения
+        self.overflowed = False
+        # Сообщения, уже отданные из базы при подписке
+        self.replayed = set()
+
+    def put(self, event):
+        if event.id not in self.replayed:
+            self._enqueue(event)
+
+    def replay(self, event):
+        """Кладёт сохранённое сообщение; poll() его уже не доставит."""
+        self.replayed.add(event.id)
+        self._enqueue(event)
+
+    def _enqueue(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Накопившиеся сообщения; пустой список по истечении timeout."""
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Hub:
+    """Раздаёт новые сообщения из базы подписчикам процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+        self._thread = None
+        self._last_id = None
+        # Номера доставленных сообщений в окне PUBSUB_LOOKBACK
+        self._delivered = set()
+        self._pruned = time.monotonic()
+
+    def _latest_id(self):
+        last = Notification.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first()
+        return last or 0
+
+    def _window(self):
+        """Последний номер и уже сохранённые сообщения в окне за ним.
+
+        Сообщения, записанные до появления подписчиков, новыми не
+        считаются.
+        """
+        last = self._latest_id()
+        return last, set(Notification.objects.filter(
+            pk__gt=last - settings.PUBSUB_LOOKBACK, pk__lte=last
+        ).values_list('pk', flat=True))
+
+    def subscribe(self, channels, last_id=None):
+        """Подписка на каналы channels.
+
+        Если передан last_id, в очередь сразу попадают сохранённые
+        сообщения каналов с большим номером.
+        """
+        subscription = Subscription(self, channels)
+        window = None
+        while True:
+            # Окно читается из базы вне блокировки; если поток
+            # успел сбросить позицию после проверки, читаем снова
+            if window is None and self._last_id is None:
+                window = self._window()
+            with self._lock:
+                if self._last_id is None:
+                    if window is None:
+                        continue
+                    self._last_id, self._delivered = window
+                for channel in subscription.channels:
+                    self._channels[channel].add(subscription)
+                # Всё, что новее, доставит poll()
+                current = self._last_id
+                break
+        if last_id is not None and last_id < current:
+            for event in _events(Notification.objects.filter(
+                channel__in=subscription.channels,
+                pk__gt=last_id,
+                pk__lte=current,
+            )):
+                subscription.replay(event)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def poll(self):
+        """Доставляет подписчикам новые сообщения; возвращает их число."""
+        with self._lock:
+            last_id, delivered = self._last_id, set(self._delivered)
+        if last_id is None:
+            return 0
+        events = _events(
+            Notification.objects.filter(
+                pk__gt=last_id - settings.PUBSUB_LOOKBACK
+            ).exclude(pk__in=delivered),
+            settings.PUBSUB_BATCH_SIZE,
+        )
+        with self._lock:
+            for event in events:
+                for subscription in self._channels.get(event.channel, ()):
+                    subscription.put(event)
+                self._delivered.add(event.id)
+            if events:
+                self._last_id = max(last_id, events[-1].id)
+                floor = self._last_id - settings.PUBSUB_LOOKBACK
+                self._delivered = {
+                    pk for pk in self._delivered if pk > floor
+                }
+        return len(events)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self._channels:
+                self._thread = threading.Thread(
+                    target=self._run, name='pubsub', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._channels:
+                        # Подписчиков не осталось: поток завершается,
+                        # а следующий подписчик прочитает окно заново
+                        self._thread = None
+                        self._last_id = None
+                        self._delivered = set()
+                        return
+                try:
+                    if self.poll() >= settings.PUBSUB_BATCH_SIZE:
+                        continue
+                    if (time.monotonic() - self._pruned
+                            > settings.PUBSUB_PRUNE_INTERVAL):
+                        self._pruned = time.monotonic()
+                        prune()
+                except DatabaseError:
+                    logger.exception('Не удалось прочитать сообщения')
+                time.sleep(settings.PUBSUB_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+
+hub = Hub()
+
+
+def _format(event, name):
+    return f'id: {event.id}\nevent: {name}\ndata: {event.payload}\n\n'
+
+
+def _last_event_id(request):
+    value = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get(
+        'last_event_id'
+    )
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stream(subscription, name):
+    started = time.monotonic()
+    try:
+        yield f'retry: {settings.SSE_RETRY}\n\n'
+        while time.monotonic() - started < settings.SSE_MAX_DURATION:
+            events = subscription.get(settings.SSE_HEARTBEAT)
+            if subscription.overflowed:
+                # Клиент переподключится с Last-Event-ID
+                # и получит пропущенное из базы
+                return
+            if not events:
+                yield ': ping\n\n'
+            for event in events:
+                yield _format(event, name)
+    finally:
+        subscription.close()
+
+
+def stream(request, channels, name):
+    """Поток Server-Sent Events с сообщениями каналов channels.
+
+    Соединение закрывается через SSE_MAX_DURATION секунд, чтобы не
+    занимать процесс надолго; браузер переподключается сам.
+    """
+    subscription = hub.subscribe(channels, _last_event_id(request))
+    response = StreamingHttpResponse(
+        _stream(subscription, name), content_type='text/event-stream'
+    )
+    # Подписка снимается, даже если клиент ушёл до первого события
+    response._closable_objects.append(subscription)
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен копить события в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,270 @@
+# core/querycache.py
+"""Кеширование результатов запросов с точной инвалидацией.
+
+Кеш включается явно: основной менеджер модели читает из базы, но
+сбрасывает кеш при записи, а кеширующий менеджер используется
+только в горячих местах:
+
+    objects = InvalidatingManager()
+    cached = CachingManager()
+
+    class Meta:
+        base_manager_name = 'objects'
+
+Результат выборки хранится под ключом из SQL, параметров и
+поколений затронутых таблиц. Если запрос ограничен равенством
+по первичному или внешнему ключу основной таблицы (например,
+Post.cached.filter(group=group)), вместо поколения всей таблицы
+берётся поколение этого значения ключа: его увеличивает только
+запись строк со старым или новым значением. Поколение таблицы,
+от которого зависят остальные выборки, увеличивает любая запись
+строки. update(), bulk_create
+и _raw_delete сигналов не отправляют и сбрасывают таблицу целиком.
+Удаление объекта, на который ссылаются с on_delete=SET_NULL
+(например, группы поста), тоже сбрасывает таблицу: Django
+обнуляет ссылки запросом мимо менеджеров. Внутри транзакции кеш
+не используется, пока не разрешено QUERY_CACHE_IN_ATOMIC.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models.expressions import Col
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .paginator import _generation_key, bump_generation
+
+
+def _bulk_key(table):
+    return f'querycache:bulk:{table}'
+
+
+def _scope_key(table, column, value):
+    return f'querycache:scope:{table}:{column}:{value}'
+
+
+def _incr(keys):
+    for key in keys:
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+
+def _bump(keys, using):
+    """Увеличивает поколения сейчас и ещё раз после коммита.
+
+    Второй раз нужен, чтобы чтение между записью и коммитом
+    не оставило в кеше старый результат.
+    """
+    _incr(keys)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(lambda: _incr(keys), using=using)
+
+
+def _scoped_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if field.primary_key or isinstance(field, models.ForeignKey)
+    ]
+
+
+def invalidate_model(model, using=None):
+    """Сбрасывает все кешированные выборки модели."""
+    bump_generation(model)
+    _bump([_bulk_key(model._meta.db_table)], using or 'default')
+
+
+def remember_scope(sender, instance, **kwargs):
+    # Значения ключей при загрузке: при смене группы поста
+    # нужно сбросить выборки и старой, и новой группы
+    instance._querycache_scope = {
+        field.column: getattr(instance, field.attname)
+        for field in _scoped_fields(sender)
+    }
+
+
+# Модели с InvalidatingManager или CachingManager
+_tracked = set()
+
+
+def invalidate_referrers(sender, using, **kwargs):
+    """Сбрасывает выборки моделей, ссылки которых обнулило удаление."""
+    for relation in sender._meta.related_objects:
+        if relation.related_model not in _tracked:
+            continue
+        if relation.on_delete in (models.CASCADE, models.PROTECT):
+            continue
+        invalidate_model(relation.related_model, using)
+
+
+def invalidate_instance(sender, instance, using, **kwargs):
+    table = sender._meta.db_table
+    old = getattr(instance, '_querycache_scope', {})
+    # Выборки без ограничения по ключу зависят от всей таблицы
+    keys = {_generation_key(table)}
+    for field in _scoped_fields(sender):
+        for value in (old.get(field.column), getattr(instance, field.attname)):
+            if value is not None:
+                keys.add(_scope_key(table, field.column, value))
+    _bump(sorted(keys), using)
+    remember_scope(sender, instance)
+
+
+class InvalidatingQuerySet(models.QuerySet):
+    """Выборка без кеширования, сбрасывающая кеш при записи."""
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        invalidate_model(self.model, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        invalidate_model(self.model, self.db)
+        return objs
+
+    def _raw_delete(self, using):
+        rows = super()._raw_delete(using)
+        invalidate_model(self.model, using)
+        return rows
+
+    _raw_delete.alters_data = True
+
+
+class CachingQuerySet(InvalidatingQuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+        self._cache_enabled = True
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        clone._cache_enabled = self._cache_enabled
+        return clone
+
+    def cache(self, timeout):
+        """Выборка с собственным временем жизни в кеше."""
+        clone = self._chain()
+        clone._cache_timeout = timeout
+        return clone
+
+    def nocache(self):
+        """Выборка, которая всегда читается из базы."""
+        clone = self._chain()
+        clone._cache_enabled = False
+        return clone
+
+    def _timeout(self):
+        if self._cache_timeout is not None:
+            return self._cache_timeout
+        return settings.QUERY_CACHE_TIMEOUTS.get(
+            self.model._meta.label, settings.QUERY_CACHE_TIMEOUT
+        )
+
+    def _cacheable(self):
+        if not self._cache_enabled or self._prefetch_related_lookups:
+            return False
+        if self.query.select_for_update:
+            return False
+        return (settings.QUERY_CACHE_IN_ATOMIC
+                or not connections[self.db].in_atomic_block)
+
+    def _scope(self):
+        """Равенство по ключу основной таблицы, ограничивающее выборку."""
+        where = self.query.where
+        if where.connector != 'AND' or where.negated:
+            return None
+        scoped = {field.column for field in _scoped_fields(self.model)}
+        for lookup in where.children:
+            if getattr(lookup, 'lookup_name', None) != 'exact':
+                continue
+            lhs, rhs = lookup.lhs, lookup.rhs
+            if not isinstance(lhs, Col) or lhs.alias != self.query.base_table:
+                continue
+            if lhs.target.column not in scoped:
+                continue
+            if isinstance(rhs, models.Model):
+                rhs = rhs.pk
+            if isinstance(rhs, (int, str)):
+                return lhs.target.column, rhs
+        return None
+
+    def _cache_key(self):
+        compiler = self.query.get_compiler(using=self.db)
+        sql, params = compiler.as_sql()
+        table = self.model._meta.db_table
+        keys = [_bulk_key(table)]
+        scope = self._scope()
+        if scope is not None:
+            keys.append(_scope_key(table, *scope))
+        else:
+            keys.append(_generation_key(table))
+        for alias, join in self.query.alias_map.items():
+            # Обрезанные соединения остаются в alias_map без ссылок
+            if alias != self.query.base_table and (
+                self.query.alias_refcount[alias]
+            ):
+                keys.append(_generation_key(join.table_name))
+        keys = sorted(set(keys))
+        generations = cache.get_many(keys)
+        source = repr((
+            self.db, sql, params, self._iterable_class.__name__,
+            self._fields, [generations.get(key) for key in keys],
+        ))
+        return 'querycache:' + hashlib.sha1(source.encode()).hexdigest()
+
+    def _fetch_all(self):
+        if self._result_cache is not None or not self._cacheable():
+            return super()._fetch_all()
+        try:
+            key = self._cache_key()
+        except EmptyResultSet:
+            return super()._fetch_all()
+        result = cache.get(key)
+        if result is not None:
+            self._result_cache = result
+            return
+        super()._fetch_all()
+        cache.set(key, self._result_cache, self._timeout())
+
+
+def _track(model):
+    if model._meta.abstract or model in _tracked:
+        return
+    _tracked.add(model)
+    uid = f'querycache:{model._meta.label}'
+    post_init.connect(
+        remember_scope, sender=model, weak=False, dispatch_uid=uid
+    )
+    post_save.connect(
+        invalidate_instance, sender=model, weak=False, dispatch_uid=uid
+    )
+    post_delete.connect(
+        invalidate_instance, sender=model, weak=False, dispatch_uid=uid
+    )
+    post_delete.connect(
+        invalidate_referrers, dispatch_uid='querycache:referrers'
+    )
+
+
+class InvalidatingManager(models.Manager.from_queryset(InvalidatingQuerySet)):
+    """Менеджер без кеширования, сбрасывающий кеш при записи."""
+
+    def contribute_to_class(self, model, name):
+        super().contribute_to_class(model, name)
+        _track(model)
+
+
+class CachingManager(models.Manager.from_queryset(CachingQuerySet)):
+    """Менеджер с кешированием выборок (см. описание модуля)."""
+
+    def contribute_to_class(self, model, name):
+        super().contribute_to_class(model, name)
+        _track(model)
@@ -0,0 +1,50 @@
+# core/storage.py
+import gzip
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+
+def compress_variants(content):
+    """Сжатые варианты содержимого: {расширение: байты}."""
+    variants = {
+        '.gz': gzip.compress(content, settings.STATIC_GZIP_LEVEL),
+    }
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и заранее сжатыми копиями.
+
+    При collectstatic рядом с каждым текстовым файлом сохраняются
+    .gz (и .br, если установлен brotli), которые отдаёт
+    core.middleware.StaticFilesMiddleware.
+    """
+    # Имени нет в манифесте: хеш считается по файлу, а не ошибка
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(settings.STATIC_COMPRESS_EXTENSIONS):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            for suffix, compressed in compress_variants(content).items():
+                # Сжатие не всегда выгодно для маленьких файлов
+                if len(compressed) >= len(content):
+                    continue
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,216 @@
+# core/tasks.py
+"""Фоновая очередь задач в основной базе данных.
+
+Задача - это импортируемая функция и JSON-аргументы:
+
+    enqueue('posts.images.process_post_image', post.pk, priority=5)
+    enqueue_on_commit(send_digest, user.pk, dedup_key=f'digest:{user.pk}')
+
+Задачи выполняет команда ``manage.py run_worker``.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+def _task_name(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def run_task(name, args, kwargs):
+    return import_string(name)(*args, **kwargs)
+
+
+def enqueue(func, *args, priority=0, dedup_key=None, delay=0,
+            max_attempts=None, **kwargs):
+    """Ставит задачу в очередь и возвращает её.
+
+    Если активная задача с тем же dedup_key уже есть,
+    новая не создаётся и возвращается существующая.
+    """
+    name = _task_name(func)
+    if settings.TASK_QUEUE_EAGER:
+        run_task(name, args, kwargs)
+        return None
+    task = Task(
+        name=name,
+        arguments=json.dumps({'args': args, 'kwargs': kwargs}),
+        priority=priority,
+        dedup_key=dedup_key,
+        max_attempts=max_attempts or settings.TASK_QUEUE_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+        return Task.objects.get(dedup_key=dedup_key)
+    return task
+
+
+def enqueue_on_commit(func, *args, using=None, **options):
+    """Ставит задачу в очередь после фиксации текущей транзакции."""
+    transaction.on_commit(
+        lambda: enqueue(func, *args, **options), using=using
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором (в секундах)."""
+    delay = settings.TASK_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+    return min(delay, settings.TASK_QUEUE_MAX_RETRY_DELAY)
+
+
+def prune_finished():
+    """Удаляет старые выполненные и упавшие задачи; возвращает их число.
+
+    Строки удаляются порциями, чтобы не держать таблицу очереди
+    заблокированной долго.
+    """
+    now = timezone.now()
+    deleted = 0
+    for status, retention in (
+        (Task.DONE, settings.TASK_QUEUE_DONE_RETENTION),
+        (Task.FAILED, settings.TASK_QUEUE_FAILED_RETENTION),
+    ):
+        old = Task.objects.filter(
+            status=status, finished__lt=now - timedelta(seconds=retention)
+        )
+        while True:
+            batch = list(old.values_list('pk', flat=True)[
+                :settings.TASK_QUEUE_PRUNE_BATCH_SIZE
+            ])
+            if not batch:
+                break
+            deleted += Task.objects.filter(pk__in=batch).delete()[0]
+    return deleted
+
+
+class Worker:
+    """Выбирает задачи из очереди и выполняет их в пуле потоков."""
+
+    def __init__(self, threads=None, batch_size=None):
+        self.threads = threads or settings.TASK_QUEUE_THREADS
+        self.batch_size = batch_size or self.threads
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopped = threading.Event()
+        self.pruned = None
+
+    def requeue_stale(self):
+        """Возвращает в очередь задачи, брошенные упавшими обработчиками."""
+        stale = timezone.now() - timedelta(
+            seconds=settings.TASK_QUEUE_LOCK_TIMEOUT
+        )
+        return Task.objects.filter(
+            status=Task.RUNNING, locked_at__lt=stale
+        ).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+    def prune(self):
+        """Удаляет старые задачи не чаще TASK_QUEUE_PRUNE_INTERVAL."""
+        now = time.monotonic()
+        if self.pruned is not None and (
+            now - self.pruned < settings.TASK_QUEUE_PRUNE_INTERVAL
+        ):
+            return 0
+        self.pruned = now
+        return prune_finished()
+
+    def claim(self):
+        """Атомарно забирает порцию готовых задач."""
+        now = timezone.now()
+        candidates = Task.objects.filter(
+            status=Task.QUEUED, run_at__lte=now
+        ).order_by('-priority', 'run_at', 'pk').values_list(
+            'pk', flat=True
+        )[:self.batch_size]
+        claimed = []
+        for pk in candidates:
+            taken = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+                status=Task.RUNNING,
+                locked_by=self.name,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if taken:
+                claimed.append(pk)
+        tasks = Task.objects.in_bulk(claimed)
+        return [tasks[pk] for pk in claimed]
+
+    def execute(self, task):
+        try:
+            arguments = json.loads(task.arguments)
+            run_task(task.name, arguments['args'], arguments['kwargs'])
+        except Exception:
+            self.fail(task, traceback.format_exc())
+        else:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.DONE,
+                dedup_key=None,
+                finished=timezone.now(),
+            )
+
+    def _execute_in_thread(self, task):
+        # У каждого потока пула своё соединение с базой
+        close_old_connections()
+        try:
+            self.execute(task)
+        finally:
+            close_old_connections()
+
+    def fail(self, task, error):
+        if task.attempts < task.max_attempts:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.QUEUED,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(task.attempts)
+                ),
+                locked_by='',
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.FAILED,
+                dedup_key=None,
+                finished=timezone.now(),
+                last_error=error,
+            )
+
+    def run_once(self, pool):
+        """Выполняет одну порцию задач, возвращает их количество."""
+        tasks = self.claim()
+        list(pool.map(self._execute_in_thread, tasks))
+        return len(tasks)
+
+    def run(self, poll_interval=None, once=False):
+        poll_interval = poll_interval or settings.TASK_QUEUE_POLL_INTERVAL
+        processed = 0
+        self.requeue_stale()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            while not self.stopped.is_set():
+                done = self.run_once(pool)
+                processed += done
+                if not done:
+                    if once:
+                        break
+                    self.requeue_stale()
+                    self.prune()
+                    self.stopped.wait(poll_interval)
+        return processed
@@ -0,0 +1,11 @@
+from django import template
+
+from core.paginator import page_window as get_page_window
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page):
+    """Номера страниц для навигации, None - пропуск."""
+    return get_page_window(page)
@@ -0,0 +1,47 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+
+from core.cache import _lock_key, get_or_compute
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_computed_once(self):
+        '''Свежее значение берётся из кеша без пересчёта'''
+        compute = mock.Mock(return_value='value')
+        for _ in range(3):
+            self.assertEqual(get_or_compute('key', compute, 60), 'value')
+        compute.assert_called_once()
+
+    def test_stale_value_while_locked(self):
+        '''Пока другой процесс пересчитывает, отдаётся устаревшее'''
+        cache.set('key', ('old', time.time() - 1, 0), 60)
+        cache.add(_lock_key('key'), 1)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(get_or_compute('key', compute, 60), 'old')
+        compute.assert_not_called()
+
+    def test_expired_value_is_refreshed(self):
+        '''Просроченное значение пересчитывается и блокировка снимается'''
+        cache.set('key', ('old', time.time() - 1, 0), 60)
+        self.assertEqual(get_or_compute('key', lambda: 'new', 60), 'new')
+        self.assertEqual(get_or_compute('key', lambda: 'other', 60), 'new')
+        self.assertIsNone(cache.get(_lock_key('key')))
+
+    def test_stale_value_on_database_error(self):
+        '''При ошибке базы отдаётся устаревшее значение'''
+        cache.set('key', ('old', time.time() - 1, 0), 60)
+        compute = mock.Mock(side_effect=DatabaseError)
+        self.assertEqual(get_or_compute('key', compute, 60), 'old')
+
+    def test_early_refresh_near_expiry(self):
+        '''Долгий пересчёт запускается заранее, до истечения срока'''
+        cache.set('key', ('old', time.time() + 1, 100), 60)
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            self.assertEqual(get_or_compute('key', lambda: 'new', 60), 'new')
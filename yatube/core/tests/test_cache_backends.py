@@ -0,0 +1,84 @@
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase
+
+from core.cache_backends import generation_key
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        cache.reset_stats()
+        self.shared = caches['shared']
+
+    def test_hot_key_served_from_local_tier(self):
+        '''Повторное чтение не обращается к общему кешу'''
+        cache.set('key', 'value')
+        # Запись мимо бэкенда не видна, пока не сменилась версия
+        self.shared.set('key', 'other')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.stats()['local']['hits'], 1)
+
+    def test_foreign_write_flushes_only_its_namespace(self):
+        '''Запись другим процессом сбрасывает только своё пространство'''
+        cache.set('lookup:key', 'value')
+        cache.set('unread:key', 'value')
+        self.shared.set('lookup:key', 'other')
+        self.shared.set('unread:key', 'other')
+        # Другой процесс записал ключ пространства lookup
+        self.shared.incr(generation_key('lookup'))
+        cache._local.checked = 0
+        self.assertEqual(cache.get('lookup:key'), 'other')
+        self.assertEqual(cache.get('unread:key'), 'value')
+
+    def test_unlisted_keys_share_namespace(self):
+        '''Ключи без известного префикса не множат счётчики поколений'''
+        for num in range(100):
+            cache.set(f'session{num}', num)
+            cache.set(f'template.cache.feed.{num}', num)
+        self.assertEqual(set(cache._local.generations), {'default'})
+
+    def test_own_writes_keep_local_tier(self):
+        '''Свои записи не сбрасывают соседние ключи пространства'''
+        cache.set('feed:first', 'value')
+        self.shared.set('feed:first', 'other')
+        cache.set('feed:second', 'value')
+        cache.delete('feed:third')
+        cache._local.checked = 0
+        self.assertEqual(cache.get('feed:first'), 'value')
+
+    def test_has_key_for_none(self):
+        '''Сохранённый None - это существующий ключ'''
+        cache.set('key', None)
+        self.assertTrue(cache.has_key('key'))
+        self.assertFalse(cache.has_key('missing'))
+
+    def test_clear_clears_both_tiers(self):
+        cache.set('key', 'value')
+        cache.clear()
+        self.assertIsNone(self.shared.get('key'))
+        self.assertIsNone(cache.get('key'))
+
+    def test_local_tier_is_bounded(self):
+        '''Локальный уровень вытесняет давно не читанные записи'''
+        max_entries = cache._local.max_entries
+        self.addCleanup(setattr, cache._local, 'max_entries', max_entries)
+        cache._local.max_entries = 5
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        self.assertEqual(len(cache._local.entries), 5)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertEqual(cache.stats()['shared']['hits'], 1)
+
+    def test_mutable_values_are_copied(self):
+        '''Изменение полученного объекта не меняет кеш'''
+        cache.set('key', ['value'])
+        cache.get('key').append('other')
+        self.assertEqual(cache.get('key'), ['value'])
+
+    def test_hit_ratios(self):
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('missing')
+        stats = cache.stats()
+        self.assertEqual(stats['local']['ratio'], 0.5)
+        self.assertEqual(stats['shared']['ratio'], 0.0)
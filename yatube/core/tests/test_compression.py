@@ -0,0 +1,80 @@
+import gzip
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.loaders import minify_html
+
+User = get_user_model()
+
+
+class MinifyTests(TestCase):
+    def test_minify_html(self):
+        '''Комментарии и отступы удаляются, pre и script не меняются'''
+        source = (
+            '<div>\n    <!-- комментарий -->\n    <p>Текст</p>\n</div>\n'
+            '<pre>  как\n  есть </pre>\n<script>\n  var a = 1;\n</script>'
+        )
+        self.assertEqual(
+            minify_html(source),
+            '<div> <p>Текст</p> </div> <pre>  как\n  есть </pre> '
+            '<script>\n  var a = 1;\n</script>'
+        )
+
+    def test_pages_rendered_from_minified_templates(self):
+        '''Шаблоны страниц загружаются уже минифицированными'''
+        response = self.client.get('/')
+        self.assertNotContains(response, 'Использованы классы бустрапа')
+        self.assertNotContains(response, '\n    ')
+
+
+@override_settings(HTML_GZIP_LEVEL=6)
+class GZipCachedMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_html_compressed_when_accepted(self):
+        '''HTML сжимается, если клиент принимает gzip'''
+        plain = self.client.get('/about/tech/')
+        response = self.client.get(
+            '/about/tech/', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_not_compressed_when_refused(self):
+        '''gzip;q=0 - отказ от gzip, а не согласие'''
+        response = self.client.get(
+            '/about/tech/', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_identical_responses_compressed_once(self):
+        '''Одинаковый ответ сжимается только один раз'''
+        with mock.patch(
+            'core.middleware.gzip.compress', wraps=gzip.compress
+        ) as compress:
+            for _ in range(3):
+                self.client.get(
+                    '/about/tech/', HTTP_ACCEPT_ENCODING='gzip'
+                )
+        self.assertEqual(compress.call_count, 1)
+
+    def test_personal_pages_not_memoized(self):
+        '''Страницы с Vary: Cookie и CSRF-токеном не попадают в кеш'''
+        user = User.objects.create_user(username='auth')
+        self.client.force_login(user)
+        with mock.patch('core.middleware.cache.set') as cache_set:
+            response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.client.logout()
+            response = self.client.get(
+                '/auth/login/', HTTP_ACCEPT_ENCODING='gzip'
+            )
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(any(
+            call[0][0].startswith('gzip:') for call in cache_set.call_args_list
+        ))
@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group
+
+User = get_user_model()
+
+
+class CachedLookupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hot_lookups_cost_no_queries(self):
+        '''Повторный поиск группы и автора не обращается к базе'''
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        profile_url = reverse('posts:profile', args=[self.user.username])
+        for url, table in ((group_url, 'posts_group'),
+                           (profile_url, 'auth_user')):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertFalse(any(
+                    f'FROM "{table}"' in query['sql'] for query in queries
+                ))
+
+    def test_missing_profile_cached(self):
+        '''Отсутствующий профиль кешируется до создания пользователя'''
+        url = reverse('posts:profile', args=['ghost'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        User.objects.create_user(username='ghost')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+
+    def test_rename_invalidates_old_and_new_values(self):
+        '''Изменение slug сбрасывает старое и новое значения'''
+        self.client.get(reverse('posts:group_list', args=['group']))
+        self.client.get(reverse('posts:group_list', args=['renamed']))
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_list', args=['group'])
+            ).status_code,
+            404
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_list', args=['renamed'])
+            ).status_code,
+            HTTPStatus.OK
+        )
+        self.group.slug = 'group'
+        self.group.save()
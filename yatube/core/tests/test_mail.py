@@ -0,0 +1,39 @@
+import json
+from email.mime.text import MIMEText
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, override_settings
+
+from core.mail import QueuedEmailBackend, send_email, serialize
+
+
+@override_settings(
+    TASK_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+)
+class QueuedEmailTests(SimpleTestCase):
+    def test_attachments_and_headers_survive_queue(self):
+        '''Вложения и заголовки доходят до отправки через очередь'''
+        message = EmailMessage(
+            'Тема', 'Текст', to=['reader@example.com'],
+            headers={'List-Unsubscribe': '<https://example.com/u/>'},
+        )
+        message.attach('data.bin', b'\x00\xff', 'application/octet-stream')
+        message.attach('note.txt', 'Заметка', 'text/plain')
+        send_email(json.loads(json.dumps(serialize(message))))
+        sent = mail.outbox[0]
+        self.assertEqual(
+            sent.extra_headers['List-Unsubscribe'],
+            '<https://example.com/u/>',
+        )
+        self.assertEqual(sent.attachments, [
+            ('data.bin', b'\x00\xff', 'application/octet-stream'),
+            ('note.txt', 'Заметка', 'text/plain'),
+        ])
+
+    def test_mime_attachment_is_rejected(self):
+        '''Письмо, которое очередь не перенесёт, не теряется молча'''
+        message = EmailMessage('Тема', 'Текст', to=['reader@example.com'])
+        message.attach(MIMEText('Часть'))
+        with self.assertRaises(ValueError):
+            QueuedEmailBackend().send_messages([message])
@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.test import (RequestFactory, SimpleTestCase,
+                         override_settings)
+
+from core import media
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+CONTENT = bytes(range(256)) * 4
+HASHED = 'posts/ab/' + 'ab' * 32 + '.jpg'
+
+
+def proxy(client, url, **headers):
+    '''Упрощённый nginx: отдаёт файл по X-Accel-Redirect'''
+    response = client.get(url, **headers)
+    location = response.get('X-Accel-Redirect')
+    if location is None:
+        return response, None
+    name = unquote(location[len(settings.MEDIA_ACCEL_PREFIX):])
+    with open(os.path.join(settings.MEDIA_ROOT, name), 'rb') as file:
+        return response, file.read()
+
+
+def not_hashed(name):
+    return name != HASHED
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_DIR, MEDIA_SERVE_BACKEND=None, MEDIA_SERVE_CHECKS=()
+)
+class MediaServeTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ('posts/photo.jpg', HASHED, 'posts/.hidden',
+                     'private/secret.txt'):
+            path = os.path.join(TEMP_DIR, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def get(self, name, **headers):
+        return self.client.get(settings.MEDIA_URL + name, **headers)
+
+    def test_full_file(self):
+        response = self.get('posts/photo.jpg')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+
+    def test_byte_range(self):
+        '''Запрос части файла возвращает 206 и только эти байты'''
+        response = self.get('posts/photo.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(CONTENT)}'
+        )
+        self.assertEqual(response['Content-Length'], '10')
+        response = self.get('posts/photo.jpg', HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get('posts/photo.jpg', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_returns_full_file(self):
+        response = self.get(
+            'posts/photo.jpg', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_etag_not_modified(self):
+        etag = self.get('posts/photo.jpg')['ETag']
+        response = self.get('posts/photo.jpg', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cache_headers(self):
+        '''Файлы с именем по хешу кешируются навсегда'''
+        self.assertIn('immutable', self.get(HASHED)['Cache-Control'])
+        self.assertEqual(
+            self.get('posts/photo.jpg')['Cache-Control'],
+            f'public, max-age={settings.MEDIA_MAX_AGE}',
+        )
+
+    def test_only_served_dirs(self):
+        '''Отдаются только видимые файлы каталогов MEDIA_SERVE_DIRS'''
+        for name in ('posts/.hidden', 'private/secret.txt',
+                     'posts/../private/secret.txt', 'posts/missing.jpg'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.get(name).status_code, HTTPStatus.NOT_FOUND
+                )
+
+    @override_settings(
+        MEDIA_SERVE_CHECKS=('core.tests.test_media.not_hashed',)
+    )
+    def test_serve_checks(self):
+        '''Проверка из MEDIA_SERVE_CHECKS запрещает отдачу файла'''
+        self.assertEqual(self.get(HASHED).status_code, HTTPStatus.NOT_FOUND)
+        response = self.get('posts/photo.jpg')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response.close()
+
+    @override_settings(MEDIA_SERVE_BACKEND='nginx')
+    def test_accel_redirect(self):
+        '''С nginx файл отдаёт прокси, а ответ Django пустой'''
+        response, body = proxy(self.client, settings.MEDIA_URL + HASHED)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'], settings.MEDIA_ACCEL_PREFIX + HASHED
+        )
+        self.assertEqual(body, CONTENT)
+        self.assertIn('immutable', response['Cache-Control'])
+        response, body = proxy(
+            self.client, settings.MEDIA_URL + 'private/secret.txt'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIsNone(body)
+
+    @override_settings(MEDIA_SERVE_BACKEND='sendfile')
+    def test_sendfile(self):
+        response = self.get('posts/photo.jpg')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(TEMP_DIR, 'posts', 'photo.jpg'),
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE_BACKEND='sendfile')
+    def test_sendfile_needs_accel_name(self):
+        '''Файл вне отдаваемых веб-сервером каталогов отдаёт Django'''
+        request = RequestFactory().get('/')
+        path = os.path.join(TEMP_DIR, 'posts', 'photo.jpg')
+        response = media.serve_file(request, path)
+        self.assertNotIn('X-Sendfile', response)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from core.models import Task
+from core.paginator import CachedCountPaginator, page_window
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Пост {num}') for num in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CachedCountPaginator(Post.objects.all(), 1)
+
+    def test_count_cached_without_count_query(self):
+        '''Повторный подсчёт обходится без COUNT(*)'''
+        self.assertEqual(self.paginator().count, 25)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.paginator().count, 25)
+
+    def test_writes_invalidate_count(self):
+        '''Вставка и удаление меняют размер выборки'''
+        self.assertEqual(self.paginator().count, 25)
+        Post.objects.bulk_create([Post(author=self.user, text='Ещё')])
+        self.assertEqual(self.paginator().count, 26)
+        Post.objects.first().delete()
+        self.assertEqual(self.paginator().count, 25)
+
+    def test_deleted_group_leaves_group_index_count(self):
+        '''Удаление не последней группы меняет размер каталога групп'''
+        first = Group.objects.create(title='Первая', slug='first')
+        Group.objects.create(title='Вторая', slug='second')
+        groups = Group.objects.all()
+        self.assertEqual(CachedCountPaginator(groups, 1).count, 2)
+        first.delete()
+        self.assertEqual(CachedCountPaginator(groups.all(), 1).count, 1)
+
+    def test_only_paginated_models_bump_generation(self):
+        '''Поколение меняют только модели с кешем выборок'''
+        Group.objects.create(title='Группа', slug='group')
+        self.user.save()
+        Post.objects.create(author=self.user, text='Новый')
+        self.assertEqual(
+            set(cache.get_many([
+                'count_generation:posts_group',
+                'count_generation:auth_user',
+                'count_generation:posts_post',
+            ])),
+            {'count_generation:posts_group', 'count_generation:posts_post'},
+        )
+
+    @override_settings(COUNT_CACHE_TIMEOUT=-1, TASK_QUEUE_EAGER=False)
+    def test_stale_count_refreshed_in_background(self):
+        '''Устаревший размер отдаётся сразу, пересчёт ставится в очередь'''
+        self.paginator().count
+        # Запись мимо менеджера не меняет поколений таблицы
+        QuerySet(Post).filter(pk=Post.objects.first().pk).update(text='-')
+        self.assertEqual(self.paginator().count, 25)
+        self.assertEqual(
+            Task.objects.get().name, 'core.paginator.refresh_count'
+        )
+
+    def test_page_window(self):
+        '''Навигация содержит края и соседей текущей страницы'''
+        paginator = self.paginator()
+        self.assertEqual(
+            page_window(paginator.page(1), 2, 1), [1, 2, 3, None, 25]
+        )
+        self.assertEqual(
+            page_window(paginator.page(10), 2, 1),
+            [1, None, 8, 9, 10, 11, 12, None, 25]
+        )
+        self.assertEqual(
+            page_window(paginator.page(24), 2, 1),
+            [1, None, 22, 23, 24, 25]
+        )
+        self.assertEqual(
+            page_window(CachedCountPaginator(Post.objects.all(), 5).page(2)),
+            [1, 2, 3, 4, 5]
+        )
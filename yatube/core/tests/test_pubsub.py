@@ -0,0 +1,138 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import pubsub
+from core.models import Notification
+
+
+def publish(channel, data):
+    pubsub.publish(channel, data)
+    return Notification.objects.latest('pk')
+
+
+@mock.patch.object(pubsub.Hub, 'start')
+class HubTests(TestCase):
+    def setUp(self):
+        self.hub = pubsub.Hub()
+        # Транзакция теста не фиксируется: сообщения пишутся сразу
+        patcher = mock.patch.object(
+            pubsub.transaction, 'on_commit',
+            lambda func, using=None: func(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_poll_delivers_to_channel_subscribers(self, start):
+        '''Сообщение получают только подписчики его канала'''
+        first = self.hub.subscribe(['a'])
+        second = self.hub.subscribe(['b'])
+        event = publish('a', {'text': 'привет'})
+        self.assertEqual(self.hub.poll(), 1)
+        received = first.get(0)
+        self.assertEqual([item.id for item in received], [event.pk])
+        self.assertEqual(received[0].payload, event.payload)
+        self.assertEqual(second.get(0), [])
+        # Повторный опрос не доставляет старое
+        self.assertEqual(self.hub.poll(), 0)
+
+    def test_replay_after_last_event_id(self, start):
+        '''При переподключении приходят пропущенные сообщения канала'''
+        missed = publish('a', 1)
+        publish('b', 2)
+        seen = publish('a', 3)
+        later = publish('a', 4)
+        subscription = self.hub.subscribe(['a'], last_id=missed.pk - 1)
+        self.hub.poll()
+        self.assertEqual(
+            [event.id for event in subscription.get(0)],
+            [missed.pk, seen.pk, later.pk],
+        )
+
+    def test_unsubscribe(self, start):
+        with self.hub.subscribe(['a']):
+            pass
+        publish('a', 1)
+        self.hub.poll()
+        self.assertEqual(dict(self.hub._channels), {})
+
+    @override_settings(PUBSUB_QUEUE_SIZE=1)
+    def test_overflow_is_flagged(self, start):
+        subscription = self.hub.subscribe(['a'])
+        publish('a', 1)
+        publish('a', 2)
+        self.hub.poll()
+        self.assertTrue(subscription.overflowed)
+
+    def test_prune(self, start):
+        publish('a', 1)
+        Notification.objects.update(
+            created=timezone.now() - timedelta(days=1)
+        )
+        fresh = publish('a', 2)
+        self.assertEqual(pubsub.prune(), 1)
+        self.assertEqual(Notification.objects.get(), fresh)
+
+    def test_late_commit_is_delivered(self, start):
+        '''Строка с меньшим номером, зафиксированная позже, доставляется'''
+        subscription = self.hub.subscribe(['a'])
+        first = publish('a', 1)
+        late = publish('a', 2)
+        last = publish('a', 3)
+        Notification.objects.filter(pk=late.pk).delete()
+        self.assertEqual(self.hub.poll(), 2)
+        late.save()
+        self.assertEqual(self.hub.poll(), 1)
+        self.assertEqual(self.hub.poll(), 0)
+        self.assertEqual(
+            [event.id for event in subscription.get(0)],
+            [first.pk, last.pk, late.pk],
+        )
+
+    def test_stopped_hub_forgets_position(self, start):
+        '''После ухода подписчиков старые сообщения не считаются новыми'''
+        with self.hub.subscribe(['a']):
+            publish('a', 1)
+            self.hub.poll()
+        with mock.patch.object(pubsub, 'connection'):
+            self.hub._run()
+        publish('a', 2)
+        subscription = self.hub.subscribe(['a'])
+        self.assertEqual(self.hub.poll(), 0)
+        fresh = publish('a', 3)
+        self.hub.poll()
+        self.assertEqual(
+            [event.id for event in subscription.get(0)], [fresh.pk]
+        )
+
+    def test_publish_waits_for_commit(self, start):
+        with mock.patch.object(pubsub.transaction, 'on_commit') as on_commit:
+            pubsub.publish('a', 1)
+        on_commit.assert_called_once()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_subscribe_survives_concurrent_reset(self, start):
+        '''Сброс позиции потоком во время подписки не ломает её'''
+        self.hub.subscribe(['a']).close()
+        latest = publish('a', 1)
+        lock = self.hub._lock
+        hub = self.hub
+
+        class ResettingLock:
+            # Поток сбрасывает позицию между проверкой и блокировкой
+            reset = True
+
+            def __enter__(self):
+                if self.reset:
+                    ResettingLock.reset = False
+                    hub._last_id = None
+                return lock.__enter__()
+
+            def __exit__(self, *exc_info):
+                return lock.__exit__(*exc_info)
+
+        self.hub._lock = ResettingLock()
+        self.hub.subscribe(['a'])
+        self.assertEqual(self.hub._last_id, latest.pk)
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_CACHE_IN_ATOMIC=True)
+class QueryCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        Post.objects.create(author=cls.user, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def group_posts(self):
+        return list(Post.cached.filter(group=self.group))
+
+    def test_repeated_query_is_cached(self):
+        '''Повторная выборка не обращается к базе'''
+        self.group_posts()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.group_posts()), 1)
+
+    def test_write_to_other_scope_keeps_cache(self):
+        '''Пост в другой группе не сбрасывает выборку группы'''
+        self.group_posts()
+        Post.objects.create(author=self.user, group=self.other, text='Ещё')
+        with self.assertNumQueries(0):
+            self.group_posts()
+
+    def test_write_to_same_scope_invalidates(self):
+        '''Новый пост и перенос поста сбрасывают выборки групп'''
+        self.group_posts()
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Ещё'
+        )
+        self.assertEqual(len(self.group_posts()), 2)
+        list(Post.cached.filter(group=self.other))
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other
+        post.save()
+        self.assertEqual(len(self.group_posts()), 1)
+        self.assertEqual(len(Post.cached.filter(group=self.other)), 1)
+
+    def test_save_invalidates_unscoped_query(self):
+        '''Сохранение строки сбрасывает выборки всей таблицы'''
+        list(Group.cached.order_by('title'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertIn(
+            'Новое название',
+            [group.title for group in Group.cached.order_by('title')],
+        )
+
+    def test_bulk_update_invalidates_table(self):
+        self.group_posts()
+        Post.objects.update(group=None)
+        self.assertEqual(self.group_posts(), [])
+
+    def test_nocache_reads_database(self):
+        self.group_posts()
+        with self.assertNumQueries(1):
+            list(Post.cached.filter(group=self.group).nocache())
+
+    @override_settings(QUERY_CACHE_IN_ATOMIC=False)
+    def test_bypassed_inside_transaction(self):
+        '''В транзакции результат всегда читается из базы'''
+        self.group_posts()
+        with self.assertNumQueries(1):
+            self.group_posts()
+
+    def test_joined_table_write_invalidates(self):
+        '''Выборка с соединением сбрасывается записью в любую таблицу'''
+        following = Post.cached.filter(author__following__user=self.user)
+        self.assertEqual(len(following), 0)
+        Follow.objects.create(user=self.user, author=self.user)
+        self.assertEqual(len(following.all()), 1)
+
+    def test_default_manager_reads_database(self):
+        '''Кеш включается явно: objects и related-менеджеры не кешируют'''
+        list(Post.objects.all())
+        with self.assertNumQueries(2):
+            list(Post.objects.all())
+            list(self.group.posts.all())
+
+    def test_set_null_on_delete_invalidates(self):
+        '''Удаление группы обнуляет ссылку и в кешированном посте'''
+        group = Group.objects.create(title='Временная', slug='temp')
+        post = Post.objects.create(author=self.user, group=group, text='Т')
+        self.assertEqual(Post.cached.get(pk=post.pk).group_id, group.pk)
+        group.delete()
+        self.assertIsNone(Post.cached.get(pk=post.pk).group_id)
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+DEFAULT_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': [
+        'django.contrib.auth.backends.ModelBackend'
+    ],
+}
+
+
+class CachedSessionTests(TestCase):
+    """Сравнение числа запросов к базе на странице без своих запросов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', password='old-password-123'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def queries_per_request(self):
+        client = Client()
+        client.force_login(self.user)
+        client.get('/about/tech/')
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/about/tech/')
+        return len(queries)
+
+    def test_benchmark_removed_queries(self):
+        '''Сессия и пользователь не требуют запросов к базе'''
+        with override_settings(**DEFAULT_AUTH):
+            default = self.queries_per_request()
+        cached = self.queries_per_request()
+        self.assertEqual(default, 2)
+        self.assertEqual(cached, 0)
+
+    def test_password_change_invalidates_user(self):
+        '''Смена пароля сбрасывает закешированного пользователя'''
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-123',
+            'new_password1': 'new-password-456',
+            'new_password2': 'new-password-456',
+        })
+        other = Client()
+        other.force_login(User.objects.get(pk=self.user.pk))
+        response = other.get('/about/tech/')
+        self.assertEqual(response.context['user'], self.user)
+        self.assertTrue(
+            response.context['user'].check_password('new-password-456')
+        )
+
+    def test_logout_invalidates_user(self):
+        '''Выход удаляет пользователя из кеша'''
+        client = Client()
+        client.force_login(self.user)
+        client.get('/about/tech/')
+        client.get(reverse('users:logout'))
+        response = client.get('/about/tech/')
+        self.assertFalse(response.context['user'].is_authenticated)
@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_DIR, 'static')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'collected')
+
+CSS = 'body { color: black; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+)
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'site.css'), 'w') as file:
+            file.write(CSS)
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+        with open(os.path.join(STATIC_ROOT, 'staticfiles.json')) as file:
+            cls.hashed = json.load(file)['paths']['css/site.css']
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_collectstatic_writes_compressed_variants(self):
+        '''collectstatic сохраняет сжатую копию файла с хешем'''
+        path = os.path.join(STATIC_ROOT, self.hashed + '.gz')
+        with gzip.open(path, 'rt') as file:
+            self.assertEqual(file.read(), CSS)
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        '''Файл с хешем отдаётся сжатым и с долгим кешированием'''
+        response = self.client.get(
+            settings.STATIC_URL + self.hashed, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(content.decode(), CSS)
+
+    def test_plain_file_without_accept_encoding(self):
+        '''Без Accept-Encoding отдаётся несжатый файл'''
+        response = self.client.get(settings.STATIC_URL + 'css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content).decode(), CSS)
+
+    def test_static_tag_uses_hashed_name(self):
+        '''Шаблонный тег static ссылается на файл с хешем'''
+        self.assertEqual(static('css/site.css'), '/static/' + self.hashed)
+        # Файла нет в манифесте: хеш считается по собранному файлу
+        with open(os.path.join(STATIC_ROOT, 'late.txt'), 'w') as file:
+            file.write('late')
+        self.assertRegex(
+            static('late.txt'), r'^/static/late\.[0-9a-f]{12}\.txt$'
+        )
+
+    def test_zero_quality_disables_encoding(self):
+        '''gzip;q=0 в Accept-Encoding запрещает сжатую копию'''
+        response = self.client.get(
+            settings.STATIC_URL + self.hashed,
+            HTTP_ACCEPT_ENCODING='gzip;q=0, identity',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(
+            settings.STATIC_URL + self.hashed,
+            HTTP_ACCEPT_ENCODING='*;q=0.5',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
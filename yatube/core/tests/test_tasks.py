@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import Worker, enqueue
+
+CALLS = []
+
+
+def record(value, suffix=''):
+    CALLS.append(f'{value}{suffix}')
+
+
+def explode():
+    raise ValueError('Ошибка задачи')
+
+
+@override_settings(
+    TASK_QUEUE_EAGER=False,
+    TASK_QUEUE_RETRY_DELAY=10,
+    TASK_QUEUE_MAX_ATTEMPTS=2,
+)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        self.worker = Worker(threads=1, batch_size=10)
+
+    def run_claimed(self):
+        for task in self.worker.claim():
+            self.worker.execute(task)
+
+    def test_tasks_run_by_priority(self):
+        '''Задачи выполняются в порядке приоритета'''
+        enqueue(record, 'низкий')
+        enqueue('core.tests.test_tasks.record', 'высокий', priority=10)
+        enqueue(record, 'отложенный', delay=60)
+        self.run_claimed()
+        self.assertEqual(CALLS, ['высокий', 'низкий'])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_dedup_key(self):
+        '''Активная задача с тем же ключом не дублируется'''
+        first = enqueue(record, 'a', dedup_key='key')
+        second = enqueue(record, 'b', dedup_key='key')
+        self.assertEqual(first.pk, second.pk)
+        self.run_claimed()
+        self.assertEqual(CALLS, ['a'])
+        # После выполнения ключ освобождается
+        self.assertNotEqual(enqueue(record, 'c', dedup_key='key').pk, first.pk)
+
+    def test_retry_with_backoff(self):
+        '''Упавшая задача повторяется с задержкой, затем помечается ошибкой'''
+        task = enqueue(explode)
+        self.run_claimed()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertIn('Ошибка задачи', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=5))
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        self.run_claimed()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+
+    def test_stale_tasks_requeued(self):
+        '''Задачи упавшего обработчика возвращаются в очередь'''
+        task = enqueue(record, 'x', suffix='!')
+        self.worker.claim()
+        Task.objects.filter(pk=task.pk).update(
+            locked_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        self.run_claimed()
+        self.assertEqual(CALLS, ['x!'])
+
+    @override_settings(
+        TASK_QUEUE_DONE_RETENTION=60,
+        TASK_QUEUE_FAILED_RETENTION=3600,
+        TASK_QUEUE_PRUNE_BATCH_SIZE=1,
+    )
+    def test_old_finished_tasks_pruned(self):
+        '''Старые завершённые задачи удаляются, активные и свежие - нет'''
+        queued = enqueue(record, 'в очереди')
+        done = [enqueue(record, num) for num in range(2)]
+        failed = enqueue(explode, max_attempts=1)
+        fresh = enqueue(record, 'свежая')
+        self.run_claimed()
+        stale = timezone.now() - timedelta(minutes=30)
+        Task.objects.filter(pk__in=[task.pk for task in done]).update(
+            finished=stale
+        )
+        Task.objects.filter(pk__in=[failed.pk, queued.pk]).update(
+            finished=stale
+        )
+        Task.objects.filter(pk=queued.pk).update(status=Task.QUEUED)
+        self.assertEqual(self.worker.prune(), 2)
+        self.assertEqual(
+            set(Task.objects.values_list('pk', flat=True)),
+            {queued.pk, failed.pk, fresh.pk},
+        )
+        # Следующая очистка - не раньше TASK_QUEUE_PRUNE_INTERVAL
+        Task.objects.filter(pk=fresh.pk).update(finished=stale)
+        self.assertEqual(self.worker.prune(), 0)
@@ -1,33 +1,155 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
-from .models import Group, Post, Comment, Follow
+from core.paginator import EstimatedCountPaginator
 
+from . import deletion
+from .groups import group_choices
+from .models import Group, Post, Comment, Follow, DeletionJob
 
-class PostAdmin(admin.ModelAdmin):
+User = get_user_model()
+
+
+def schedule_deletion(target):
+    def action(modeladmin, request, queryset):
+        for obj in queryset:
+            deletion.schedule(target, obj)
+        modeladmin.message_user(
+            request,
+            f'Поставлено в очередь на удаление: {len(queryset)}'
+        )
+    action.short_description = 'Удалить в фоне по частям'
+    action.__name__ = f'schedule_{target}_deletion'
+    return action
+
+
+class ScheduledDeletionMixin:
+    """Удаление через админку только ставит задание DeletionJob.
+
+    Стандартные delete_selected и страница удаления собирают все
+    зависимые записи в памяти и удаляют их одной транзакцией,
+    поэтому действие delete_selected убрано, а страница удаления
+    подтверждает постановку задания без обхода каскада.
+    """
+    deletion_target = None
+    # Модели, записи которых удалит задание: нужны права на их удаление
+    cascade_models = ()
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = {
+            model._meta.verbose_name for model in self.cascade_models
+            if not request.user.has_perm(
+                f'{model._meta.app_label}.delete_{model._meta.model_name}'
+            )
+        }
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        deletion.schedule(self.deletion_target, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            deletion.schedule(self.deletion_target, obj)
+
+    def response_delete(self, request, obj_display, obj_id):
+        self.message_user(
+            request, f'«{obj_display}» поставлен в очередь на удаление'
+        )
+        opts = self.model._meta
+        return HttpResponseRedirect(reverse(
+            f'admin:{opts.app_label}_{opts.model_name}_changelist',
+            current_app=self.admin_site.name,
+        ))
+
+
+class PostAdmin(ScheduledDeletionMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [schedule_deletion(DeletionJob.POST)]
+    deletion_target = DeletionJob.POST
+    cascade_models = (Comment,)
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group':
+            # Без этого список групп запрашивается для каждой строки
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = group_choices()
+            formfield.choices = (
+                [('', formfield.empty_label)] + request._group_choices
+            )
+        return formfield
 
-class GroupAdmin(admin.ModelAdmin):
+
+class GroupAdmin(ScheduledDeletionMixin, admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
     search_fields = ('title',)
     empty_value_display = '-пусто-'
+    actions = [schedule_deletion(DeletionJob.GROUP)]
+    deletion_target = DeletionJob.GROUP
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ("pk", "post", "author", "text", "created")
+    list_select_related = ("post", "author")
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'target', 'description', 'status', 'stage', 'deleted_posts',
+        'deleted_comments', 'deleted_follows', 'deleted_files', 'attempts',
+        'created', 'finished'
+    )
+    list_filter = ('status', 'target')
+    readonly_fields = [field.name for field in DeletionJob._meta.fields]
+    actions = ['retry_failed']
+
+    def retry_failed(self, request, queryset):
+        jobs = queryset.filter(status=DeletionJob.FAILED)
+        for job in jobs:
+            deletion.retry(job)
+        self.message_user(request, f'Перезапущено заданий: {len(jobs)}')
+    retry_failed.short_description = 'Перезапустить задания с ошибкой'
+
+
+class ChunkedDeletionUserAdmin(ScheduledDeletionMixin, UserAdmin):
+    actions = [schedule_deletion(DeletionJob.USER)]
+    deletion_target = DeletionJob.USER
+    cascade_models = (Post, Comment, Follow)
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
+admin.site.unregister(User)
+admin.site.register(User, ChunkedDeletionUserAdmin)
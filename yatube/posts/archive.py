@@ -0,0 +1,236 @@
+# posts/archive.py
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import CASCADE, F
+from django.http import Http404
+from django.utils import timezone
+
+from .models import ArchivedAuthor, ArchiveState, Comment, Group, Post, User
+from .routers import ARCHIVE_DB
+
+
+def get_state():
+    state, _ = ArchiveState.objects.get_or_create(pk=1)
+    return state
+
+
+def is_archived(instance):
+    return instance._state.db == ARCHIVE_DB
+
+
+def resolve_relations(posts):
+    """Подставляет архивным постам авторов и группы из основной базы.
+
+    Пост удалённого автора отбрасывается, ссылка на удалённую
+    группу обнуляется.
+    """
+    posts = list(posts)
+    authors = User.objects.in_bulk({post.author_id for post in posts})
+    groups = Group.objects.in_bulk(
+        {post.group_id for post in posts if post.group_id}
+    )
+    resolved = []
+    for post in posts:
+        if post.author_id not in authors:
+            continue
+        post.author = authors[post.author_id]
+        post.group = groups.get(post.group_id)
+        resolved.append(post)
+    return resolved
+
+
+def get_post_or_404(post_id):
+    """Ищет пост в основной базе, а затем в архиве."""
+    try:
+        return Post.objects.get(pk=post_id)
+    except Post.DoesNotExist:
+        pass
+    if ArchiveState.objects.filter(pk=1, max_post_id__gte=post_id).exists():
+        posts = resolve_relations(
+            Post.objects.using(ARCHIVE_DB).filter(pk=post_id)
+        )
+        if posts:
+            return posts[0]
+    raise Http404('Пост не найден')
+
+
+def post_comments(post):
+    """Комментарии поста; у архивного - только живых авторов."""
+    if not is_archived(post):
+        return Comment.cached.filter(post=post)
+    comments = post.comments.all()
+    authors = User.objects.in_bulk(
+        {comment.author_id for comment in comments}
+    )
+    alive = []
+    for comment in comments:
+        if comment.author_id in authors:
+            comment.author = authors[comment.author_id]
+            alive.append(comment)
+    return alive
+
+
+class ChainedPosts:
+    """Последовательность постов: сначала свежие, затем архивные.
+
+    Архивные посты всегда старше свежих, поэтому при общем
+    порядке -pub_date срезы можно брать из каждой базы отдельно.
+    Поддерживает count() и срезы, которых достаточно Paginator.
+    """
+
+    def __init__(self, recent, archived):
+        self.recent = recent
+        self.archived = archived
+        self._recent_count = None
+
+    def _count_recent(self):
+        if self._recent_count is None:
+            self._recent_count = self.recent.count()
+        return self._recent_count
+
+    def count(self):
+        return self._count_recent() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            items = self[key:key + 1]
+            if not items:
+                raise IndexError(key)
+            return items[0]
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        border = self._count_recent()
+        items = list(self.recent[start:min(stop, border)]) if (
+            start < border
+        ) else []
+        if stop > border:
+            items += resolve_relations(
+                self.archived[max(start - border, 0):stop - border]
+            )
+        return items
+
+
+def author_posts(author):
+    """Посты автора с учётом архива."""
+    recent = Post.cached.filter(author=author)
+    has_archive = ArchivedAuthor.objects.filter(
+        author=author, posts_count__gt=0
+    ).exists()
+    if not has_archive:
+        return recent
+    archived = Post.objects.using(ARCHIVE_DB).filter(author_id=author.pk)
+    return ChainedPosts(recent, archived)
+
+
+def _delete_originals(ids):
+    """Удаляет перенесённые посты без сигналов удаления.
+
+    Пост не удалён, а перенесён: карта сайта, агрегаты групп и
+    ссылки на картинки должны его по-прежнему учитывать.
+    """
+    for relation in Post._meta.related_objects:
+        assert relation.on_delete is CASCADE, relation
+        relation.related_model.objects.filter(
+            **{f'{relation.field.name}__in': ids}
+        )._raw_delete(DEFAULT_DB_ALIAS)
+    Post.objects.filter(pk__in=ids)._raw_delete(DEFAULT_DB_ALIAS)
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит в архив одну порцию постов старше cutoff.
+
+    Посты порции блокируются в основной базе до конца переноса,
+    поэтому комментарии и правки, сделанные во время копирования,
+    не теряются. Строки копируются в архив (прежние копии после
+    прерванного переноса заменяются) вместе с копиями авторов и
+    групп, на которые они ссылаются, чтобы архив оставался
+    целостным. Затем в той же транзакции основной базы
+    обновляются счётчики и удаляются оригиналы.
+    """
+    ids = list(
+        Post.objects.filter(pub_date__lt=cutoff).order_by('pk').values_list(
+            'pk', flat=True
+        )[:batch_size]
+    )
+    if not ids:
+        return 0
+    with transaction.atomic():
+        posts = list(
+            Post.objects.select_for_update().filter(
+                pk__in=ids, pub_date__lt=cutoff
+            ).order_by('pk')
+        )
+        if not posts:
+            return 0
+        ids = [post.pk for post in posts]
+        comments = list(Comment.objects.filter(post_id__in=ids))
+        _copy_to_archive(posts, comments)
+        state = get_state()
+        state.max_post_id = max(state.max_post_id, ids[-1])
+        state.archived_posts += len(posts)
+        state.archived_comments += len(comments)
+        state.save()
+        authors = Counter(post.author_id for post in posts)
+        for author_id, count in authors.items():
+            ArchivedAuthor.objects.get_or_create(author_id=author_id)
+            ArchivedAuthor.objects.filter(author_id=author_id).update(
+                posts_count=F('posts_count') + count
+            )
+        _delete_originals(ids)
+    return len(posts)
+
+
+def _copy_to_archive(posts, comments):
+    ids = [post.pk for post in posts]
+    user_ids = {post.author_id for post in posts}
+    user_ids.update(comment.author_id for comment in comments)
+    group_ids = {post.group_id for post in posts if post.group_id}
+    with transaction.atomic(using=ARCHIVE_DB):
+        User.objects.using(ARCHIVE_DB).bulk_create(
+            User.objects.filter(pk__in=user_ids), ignore_conflicts=True
+        )
+        Group.objects.using(ARCHIVE_DB).bulk_create(
+            Group.objects.filter(pk__in=group_ids), ignore_conflicts=True
+        )
+        # Копии от прерванного переноса могли устареть
+        Comment.objects.using(ARCHIVE_DB).filter(
+            post_id__in=ids
+        )._raw_delete(ARCHIVE_DB)
+        Post.objects.using(ARCHIVE_DB).filter(pk__in=ids)._raw_delete(
+            ARCHIVE_DB
+        )
+        _insert_as_is(Post, posts)
+        _insert_as_is(Comment, comments)
+
+
+def _insert_as_is(model, objs):
+    """Вставка в архив без auto_now_add: даты сохраняются как есть."""
+    fields = model._meta.concrete_fields
+    size = max(connections[ARCHIVE_DB].ops.bulk_batch_size(fields, objs), 1)
+    queryset = model._base_manager.using(ARCHIVE_DB)
+    for start in range(0, len(objs), size):
+        queryset._insert(
+            objs[start:start + size], fields=fields, raw=True,
+            using=ARCHIVE_DB,
+        )
+
+
+def archive(days=None, batch_size=None, max_batches=None):
+    """Переносит в архив посты старше days дней порциями."""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+    return total
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+from . import unread
+
+
+def unread_count(request):
+    """Добавляет в контекст число непрочитанных постов подписок."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    count = unread.count(user)
+    return {
+        'unread_count': count,
+        'unread_overflow': count >= settings.UNREAD_MAX_COUNT,
+    }
@@ -0,0 +1,99 @@
+# posts/dedup.py
+"""Счётчики ссылок на картинки постов и сборка мусора.
+
+Счётчик ImageBlob меняется сигналами постов и служит подсказкой:
+перенос в архив и массовые операции обходят сигналы. Поэтому
+collect() перед удалением файла проверяет ссылки на него в обеих
+базах и, если они нашлись, исправляет счётчик.
+
+Хранилище отмечает каждую загрузку (claim) до записи файла, а
+ссылку пост берёт позже, при сохранении. collect() не трогает
+файлы, загруженные за последние IMAGE_GC_GRACE секунд, и удаляет
+строку ImageBlob в одной транзакции с файлом: загрузка, пришедшая
+во время удаления, ждёт её конца и записывает файл заново.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_image
+
+from . import images
+from .models import ArchiveState, ImageBlob, Post
+from .routers import ARCHIVE_DB
+
+
+def claim(name):
+    """Отмечает загрузку файла name; вызывается до записи файла."""
+    now = timezone.now()
+    if not ImageBlob.objects.filter(name=name).update(uploaded=now):
+        ImageBlob.objects.get_or_create(
+            name=name, defaults={'refcount': 0, 'uploaded': now}
+        )
+
+
+def acquire(name):
+    if not ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + 1
+    ):
+        ImageBlob.objects.get_or_create(name=name, defaults={'refcount': 1})
+
+
+def release(name):
+    """Уменьшает счётчик; True, если на файл больше не ссылаются."""
+    if not ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') - 1
+    ):
+        # Картинка загружена до подсчёта ссылок
+        ImageBlob.objects.get_or_create(name=name, defaults={'refcount': 0})
+    return ImageBlob.objects.filter(name=name, refcount__lte=0).exists()
+
+
+def is_referenced(name):
+    """Проверка core.media: картинку без ссылок не отдаём.
+
+    Файл удалённого поста живёт до сборки мусора, но по MEDIA_URL
+    уже недоступен. Файлы без строки ImageBlob (копии, миниатюры,
+    картинки до подсчёта ссылок) не ограничиваются.
+    """
+    return not ImageBlob.objects.filter(name=name, refcount__lte=0).exists()
+
+
+def references(name):
+    count = Post.objects.filter(image=name).count()
+    if ArchiveState.objects.filter(archived_posts__gt=0).exists():
+        count += Post.objects.using(ARCHIVE_DB).filter(image=name).count()
+    return count
+
+
+def collect(names=None):
+    """Удаляет картинки без ссылок с миниатюрами и копиями.
+
+    Возвращает число удалённых файлов.
+    """
+    border = timezone.now() - timedelta(seconds=settings.IMAGE_GC_GRACE)
+    unused = Q(refcount__lte=0) & (
+        Q(uploaded__isnull=True) | Q(uploaded__lt=border)
+    )
+    blobs = ImageBlob.objects.filter(unused)
+    if names is not None:
+        blobs = blobs.filter(name__in=names)
+    field = Post._meta.get_field('image')
+    deleted = 0
+    for name in blobs.values_list('name', flat=True):
+        count = references(name)
+        if count:
+            ImageBlob.objects.filter(name=name).update(refcount=count)
+            continue
+        with transaction.atomic():
+            # Строка удаляется первой: claim() той же картинки
+            # дождётся конца транзакции и запишет файл заново
+            if not ImageBlob.objects.filter(unused, name=name).delete()[0]:
+                continue
+            # Удаляет файл, его миниатюры и записи sorl-thumbnail
+            delete_image(field.attr_class(None, field, name))
+            images.delete_renditions(name)
+        deleted += 1
+    return deleted
@@ -0,0 +1,208 @@
+# posts/deletion.py
+"""Удаление пользователей, постов и групп небольшими порциями.
+
+Стандартное каскадное удаление Django загружает все зависимые
+объекты в память и держит блокировку записи SQLite всё время
+удаления. Здесь зависимые записи удаляются порциями по
+DELETION_BATCH_SIZE, каждая в своей транзакции, в фоновой
+очереди. Этапы идемпотентны: прерванное задание безопасно
+продолжается повторным запуском.
+"""
+import time
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.tasks import enqueue_on_commit
+
+from . import dedup, sitemaps
+from .models import (ArchivedAuthor, ArchiveState, Comment, DeletionJob,
+                     Follow, Group, Post, User)
+from .routers import ARCHIVE_DB
+
+
+def schedule(target, obj):
+    """Создаёт задание на удаление и ставит его в очередь."""
+    job = DeletionJob.objects.create(
+        target=target, object_id=obj.pk, description=str(obj)[:200]
+    )
+    _enqueue(job)
+    return job
+
+
+def _enqueue(job):
+    enqueue_on_commit(
+        run_job,
+        job.pk,
+        dedup_key=f'delete:{job.target}:{job.object_id}',
+        max_attempts=settings.DELETION_MAX_ATTEMPTS,
+    )
+
+
+def retry(job):
+    """Снова ставит в очередь задание, завершившееся ошибкой."""
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.QUEUED, attempts=0, last_error=''
+    )
+    _enqueue(job)
+
+
+def _batches(queryset):
+    """Порции первичных ключей до исчерпания выборки."""
+    while True:
+        ids = list(
+            queryset.order_by('pk').values_list('pk', flat=True)[
+                :settings.DELETION_BATCH_SIZE
+            ]
+        )
+        if not ids:
+            return
+        yield ids
+        # Отпускаем базу между порциями
+        time.sleep(settings.DELETION_BATCH_PAUSE)
+
+
+def _progress(job, stage, **counts):
+    job.stage = stage
+    update = {'stage': stage}
+    for field, value in counts.items():
+        update[field] = F(field) + value
+    DeletionJob.objects.filter(pk=job.pk).update(**update)
+
+
+def _delete_in_batches(job, stage, queryset, counter):
+    model = queryset.model
+    for ids in _batches(queryset):
+        with transaction.atomic(using=queryset.db):
+            model.objects.using(queryset.db).filter(pk__in=ids).delete()
+        _progress(job, stage, **{counter: len(ids)})
+
+
+def _delete_posts(job, queryset):
+    """Удаляет посты порциями вместе с картинками и миниатюрами."""
+    _delete_in_batches(
+        job,
+        'comments_on_posts',
+        Comment.objects.using(queryset.db).filter(post__in=queryset),
+        'deleted_comments',
+    )
+    for ids in _batches(queryset):
+        posts = Post.objects.using(queryset.db).filter(pk__in=ids)
+        images = set(posts.exclude(image='').values_list('image', flat=True))
+        with transaction.atomic(using=queryset.db):
+            posts.delete()
+        _progress(job, 'posts', deleted_posts=len(ids))
+        _delete_orphaned_images(job, images)
+
+
+def _delete_orphaned_images(job, names):
+    # Удаляет файлы без ссылок вместе с миниатюрами и копиями
+    deleted = dedup.collect(names)
+    if deleted:
+        _progress(job, 'files', deleted_files=deleted)
+
+
+def _delete_user(job):
+    user_id = job.object_id
+    _delete_in_batches(
+        job, 'comments', Comment.objects.filter(author_id=user_id),
+        'deleted_comments'
+    )
+    _delete_in_batches(
+        job, 'follows', Follow.objects.filter(user_id=user_id),
+        'deleted_follows'
+    )
+    _delete_in_batches(
+        job, 'followers', Follow.objects.filter(author_id=user_id),
+        'deleted_follows'
+    )
+    _delete_posts(job, Post.objects.filter(author_id=user_id))
+    if ArchivedAuthor.objects.filter(author_id=user_id).exists():
+        _delete_in_batches(
+            job,
+            'archived_comments',
+            Comment.objects.using(ARCHIVE_DB).filter(author_id=user_id),
+            'deleted_comments',
+        )
+        _delete_posts(
+            job, Post.objects.using(ARCHIVE_DB).filter(author_id=user_id)
+        )
+    User.objects.filter(pk=user_id).delete()
+
+
+def _delete_post(job):
+    _delete_posts(job, Post.objects.filter(pk=job.object_id))
+
+
+def _detach_posts(job, stage, queryset):
+    # update() не вызывает сигналы: агрегаты группы и карту сайта
+    # поправляем сами, кеш запросов сбрасывает update()
+    for ids in _batches(queryset):
+        with transaction.atomic(using=queryset.db):
+            Post.objects.using(queryset.db).filter(pk__in=ids).update(
+                group=None, updated=timezone.now()
+            )
+            Group.objects.filter(pk=job.object_id).update(
+                posts_count=Greatest(F('posts_count') - len(ids), 0)
+            )
+        chunks = {sitemaps.chunk_number(pk): pk for pk in ids}
+        for post_id in chunks.values():
+            sitemaps.mark_dirty(post_id)
+        _progress(job, stage)
+
+
+def _delete_group(job):
+    group_id = job.object_id
+    _detach_posts(job, 'detach_posts', Post.objects.filter(group_id=group_id))
+    # Архивные посты ссылаются на группу из основной базы
+    if ArchiveState.objects.filter(archived_posts__gt=0).exists():
+        _detach_posts(
+            job,
+            'detach_archived_posts',
+            Post.objects.using(ARCHIVE_DB).filter(group_id=group_id),
+        )
+        Group.objects.using(ARCHIVE_DB).filter(pk=group_id).delete()
+    Group.objects.filter(pk=group_id).delete()
+
+
+HANDLERS = {
+    DeletionJob.USER: _delete_user,
+    DeletionJob.POST: _delete_post,
+    DeletionJob.GROUP: _delete_group,
+}
+
+
+def run_job(job_id):
+    """Выполняет задание; ошибка возвращает его в очередь.
+
+    После DELETION_MAX_ATTEMPTS неудачных запусков задание получает
+    статус FAILED с текстом ошибки и больше не повторяется, пока его
+    не перезапустят из админки.
+    """
+    job = DeletionJob.objects.get(pk=job_id)
+    if job.status in (DeletionJob.DONE, DeletionJob.FAILED):
+        return
+    job.attempts += 1
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.RUNNING, attempts=job.attempts
+    )
+    try:
+        HANDLERS[job.target](job)
+    except Exception:
+        failed = job.attempts >= settings.DELETION_MAX_ATTEMPTS
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJob.FAILED if failed else DeletionJob.QUEUED,
+            last_error=traceback.format_exc(),
+            finished=timezone.now() if failed else None,
+        )
+        if failed:
+            return
+        # Повтор с задержкой выполнит очередь задач
+        raise
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.DONE, stage='done', finished=timezone.now()
+    )
@@ -0,0 +1,135 @@
+# posts/digest.py
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import DigestState, Follow, PostEvent, User
+
+logger = logging.getLogger(__name__)
+
+
+def record_new_post(post):
+    """Запоминает публикацию одной вставкой, без обхода подписчиков."""
+    PostEvent.objects.create(post=post, author_id=post.author_id)
+
+
+def _open_window(state):
+    ids = PostEvent.objects.filter(pk__gt=state.last_event_id).order_by(
+        'pk'
+    ).values_list('pk', flat=True)[:settings.DIGEST_MAX_EVENTS]
+    ids = list(ids)
+    if ids:
+        state.window_end_id = ids[-1]
+        state.last_user_id = 0
+        state.save()
+    return bool(ids)
+
+
+def _close_window(state):
+    state.last_event_id = state.window_end_id
+    state.window_end_id = 0
+    state.last_user_id = 0
+    state.save()
+    PostEvent.objects.filter(pk__lte=state.last_event_id).delete()
+
+
+def _pending(state, limit):
+    """Подписчики окна с их новыми постами - четырьмя запросами."""
+    events = PostEvent.objects.filter(
+        pk__gt=state.last_event_id, pk__lte=state.window_end_id
+    ).select_related('post__author').order_by('pk')
+    posts_by_author = defaultdict(list)
+    for event in events:
+        posts_by_author[event.author_id].append(event.post)
+    followers = Follow.objects.filter(
+        author_id__in=posts_by_author, user_id__gt=state.last_user_id
+    )
+    # Следующие limit подписчиков по возрастанию id - срезом в запросе,
+    # а не обходом всех подписчиков окна
+    user_ids = list(
+        followers.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).distinct()[:limit]
+    )
+    if not user_ids:
+        return
+    follows = followers.filter(user_id__lte=user_ids[-1]).order_by(
+        'user_id'
+    ).values_list('user_id', 'author_id')
+    authors_by_user = defaultdict(list)
+    for user_id, author_id in follows:
+        authors_by_user[user_id].append(author_id)
+    users = User.objects.in_bulk(list(authors_by_user))
+    for user_id, author_ids in authors_by_user.items():
+        posts = [
+            post
+            for author_id in author_ids
+            for post in posts_by_author[author_id]
+        ]
+        posts.sort(key=lambda post: post.pub_date, reverse=True)
+        yield users[user_id], posts
+
+
+def absolute_url(path):
+    """Полный адрес страницы сайта для писем."""
+    return settings.SITEMAP_BASE_URL.rstrip('/') + path
+
+
+def render_digest(user, posts):
+    entries = [
+        (post, absolute_url(reverse('posts:post_detail', args=[post.pk])))
+        for post in posts
+    ]
+    body = render_to_string(
+        'posts/email/digest.txt', {'user': user, 'entries': entries}
+    )
+    return EmailMessage(
+        subject=f'Новые посты в ваших подписках: {len(posts)}',
+        body=body,
+        to=[user.email],
+    )
+
+
+def send_digests(max_users=None, batch_size=None):
+    """Рассылает дайджесты не более чем max_users подписчикам.
+
+    Письма уходят пачками по batch_size через одно соединение.
+    Возвращает метрики прогона.
+    """
+    max_users = max_users or settings.DIGEST_MAX_PER_RUN
+    batch_size = batch_size or settings.DIGEST_BATCH_SIZE
+    started = time.monotonic()
+    metrics = {'users': 0, 'emails': 0, 'posts': 0}
+    state, _ = DigestState.objects.get_or_create(pk=1)
+    # Дайджесты пишет фоновый процесс, поэтому письма отправляются
+    # напрямую, минуя очередь EMAIL_BACKEND
+    connection = get_connection(settings.TASK_EMAIL_BACKEND)
+    while metrics['users'] < max_users:
+        if not state.window_end_id and not _open_window(state):
+            break
+        pending = list(_pending(state, max_users - metrics['users']))
+        if not pending:
+            _close_window(state)
+            continue
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            messages = [
+                render_digest(user, posts)
+                for user, posts in batch if user.email
+            ]
+            metrics['emails'] += connection.send_messages(messages) or 0
+            metrics['users'] += len(batch)
+            metrics['posts'] += sum(len(posts) for _, posts in batch)
+            state.last_user_id = batch[-1][0].pk
+            state.save(update_fields=['last_user_id'])
+    metrics['seconds'] = time.monotonic() - started
+    metrics['emails_per_second'] = (
+        metrics['emails'] / metrics['seconds'] if metrics['seconds'] else 0
+    )
+    logger.info('Рассылка дайджестов: %s', metrics)
+    return metrics
@@ -0,0 +1,78 @@
+# posts/groups.py
+from django.core.cache import cache
+from django.db.models import F, Max, Q
+
+from .models import ArchiveState, Group, Post
+from .routers import ARCHIVE_DB
+
+GROUP_CHOICES_KEY = 'groups:choices'
+
+
+def add_post(group_id, pub_date):
+    """Учитывает новый пост в агрегатах группы."""
+    Group.objects.filter(pk=group_id).update(posts_count=F('posts_count') + 1)
+    Group.objects.filter(
+        Q(last_post_date__lt=pub_date) | Q(last_post_date__isnull=True),
+        pk=group_id
+    ).update(last_post_date=pub_date)
+
+
+def remove_post(group_id, pub_date):
+    """Убирает пост из агрегатов группы.
+
+    Дату последнего поста пересчитываем, только если удалён
+    самый свежий пост группы: это одно чтение по индексу.
+    """
+    Group.objects.filter(pk=group_id, posts_count__gt=0).update(
+        posts_count=F('posts_count') - 1
+    )
+    if Group.objects.filter(pk=group_id, last_post_date=pub_date).exists():
+        refresh_last_post_date(group_id)
+
+
+def refresh_last_post_date(group_id):
+    last = Post.objects.filter(group_id=group_id).aggregate(
+        last=Max('pub_date')
+    )['last']
+    Group.objects.filter(pk=group_id).update(last_post_date=last)
+
+
+def recount(groups=None):
+    """Полный пересчёт агрегатов (для исправления расхождений).
+
+    Запускается командой recount_groups; возвращает число групп.
+    """
+    groups = Group.objects.all() if groups is None else groups
+    # Перенесённые в архив посты остаются в числе постов группы
+    with_archive = ArchiveState.objects.filter(archived_posts__gt=0).exists()
+    done = 0
+    for group in groups.iterator():
+        stats = Post.objects.filter(group=group).aggregate(
+            last=Max('pub_date')
+        )
+        count = Post.objects.filter(group=group).count()
+        if with_archive:
+            count += Post.objects.using(ARCHIVE_DB).filter(
+                group_id=group.pk
+            ).count()
+        Group.objects.filter(pk=group.pk).update(
+            posts_count=count,
+            last_post_date=stats['last']
+        )
+        done += 1
+    return done
+
+
+def group_choices():
+    """Список (id, название) всех групп из кеша."""
+    choices = cache.get(GROUP_CHOICES_KEY)
+    if choices is None:
+        choices = list(
+            Group.objects.order_by('title').values_list('pk', 'title')
+        )
+        cache.set(GROUP_CHOICES_KEY, choices)
+    return choices
+
+
+def forget_group_choices():
+    cache.delete(GROUP_CHOICES_KEY)
@@ -0,0 +1,197 @@
+# posts/images.py
+"""Обработка картинок постов после загрузки.
+
+Загруженный файл не изменяется: его имя - хеш содержимого, и
+повторная обработка (regenerate_thumbnails --force) не должна
+накапливать потери от пересжатия. В памяти картинка поворачивается
+по EXIF и уменьшается до IMAGE_MAX_SIZE, а затем для каждой ширины
+из IMAGE_RENDITION_WIDTHS, не превышающей ширину картинки, и для
+каждого формата из IMAGE_RENDITION_FORMATS сохраняется копия в
+каталоге, названном по имени исходного файла. Копии сохраняются
+без метаданных, кроме цветового профиля ICC. Размеры картинки
+записываются в пост: по ним шаблон строит srcset без обращения
+к хранилищу, а пока их нет, показывается миниатюра sorl-thumbnail.
+Туда же записываются заглушка - копия шириной IMAGE_PLACEHOLDER_SIZE
+в data URI - и средний цвет: страница показывает их на месте
+картинки, пока та лениво загружается.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# Поля поста, которые заполняет обработка картинки
+INFO_FIELDS = ('image_width', 'image_height', 'image_placeholder',
+               'image_color')
+
+
+def storage():
+    """Хранилище картинок постов: в нём лежат и оригиналы, и копии."""
+    return Post.image.field.storage
+
+
+def formats():
+    """Форматы копий, которые умеет сохранять установленный Pillow."""
+    return [
+        fmt for fmt in settings.IMAGE_RENDITION_FORMATS
+        if fmt != 'webp' or features.check('webp')
+    ]
+
+
+def rendition_widths(width):
+    widths = {w for w in settings.IMAGE_RENDITION_WIDTHS if w < width}
+    return sorted(widths | {width})
+
+
+def rendition_dir(name):
+    return f'{settings.IMAGE_RENDITION_DIR}/{os.path.basename(name)}'
+
+
+def rendition_name(name, width, fmt):
+    return f'{rendition_dir(name)}/{width}.{fmt}'
+
+
+def renditions(post):
+    """Источники для <picture>: srcset каждого формата.
+
+    Пустой список, если картинка ещё не обработана.
+    """
+    if not post.image or not post.image_width:
+        return []
+    sources = []
+    for fmt in formats():
+        urls = [
+            (storage().url(rendition_name(post.image.name, w, fmt)), w)
+            for w in rendition_widths(post.image_width)
+        ]
+        sources.append({
+            'type': FORMATS[fmt][1],
+            'srcset': ', '.join(f'{url} {w}w' for url, w in urls),
+            'src': urls[-1][0],
+        })
+    return sources
+
+
+def _save_rendition(name, image, pil_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    storage().save_as(name, ContentFile(buffer.getvalue()))
+
+
+def placeholder(image):
+    """Заглушка картинки: (data URI крошечной копии, цвет #rrggbb)."""
+    rgb = image.convert('RGB')
+    color = '#%02x%02x%02x' % rgb.resize((1, 1), Image.BOX).getpixel((0, 0))
+    tiny = rgb.copy()
+    tiny.thumbnail(
+        (settings.IMAGE_PLACEHOLDER_SIZE, settings.IMAGE_PLACEHOLDER_SIZE),
+        Image.BOX,
+    )
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=settings.IMAGE_PLACEHOLDER_QUALITY)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{data}', color
+
+
+def normalize(image):
+    """Поворот по EXIF и ограничение размера; метаданные не копируются."""
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(
+        (settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE), Image.LANCZOS
+    )
+    return image
+
+
+def render(name):
+    """Сохраняет копии картинки; оригинал не изменяется.
+
+    Возвращает поля поста с размерами и заглушкой или None,
+    если файла нет.
+    """
+    files = storage()
+    if not files.exists(name):
+        return None
+    with files.open(name) as file:
+        source = Image.open(file)
+        source.load()
+    icc_profile = source.info.get('icc_profile')
+    if getattr(source, 'is_animated', False):
+        # Размеры анимации - по первому кадру
+        image = source
+    else:
+        image = normalize(source)
+    width, height = image.size
+    rgb = image.convert('RGB')
+    options = {'quality': settings.IMAGE_QUALITY}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    for target in rendition_widths(width):
+        resized = rgb.resize(
+            (target, max(round(height * target / width), 1)), Image.LANCZOS
+        )
+        for fmt in formats():
+            _save_rendition(
+                rendition_name(name, target, fmt),
+                resized,
+                FORMATS[fmt][0],
+                **options,
+            )
+    data_uri, color = placeholder(rgb)
+    return dict(zip(INFO_FIELDS, (width, height, data_uri, color)))
+
+
+def up_to_date(name, width):
+    """Все копии картинки ширины width на месте и не старше оригинала.
+
+    width - ширина из поста; None, если пост не обработан.
+    """
+    files = storage()
+    if not width or not files.exists(name):
+        return False
+    modified = files.get_modified_time(name)
+    for target in rendition_widths(width):
+        for fmt in formats():
+            copy = rendition_name(name, target, fmt)
+            if (not files.exists(copy)
+                    or files.get_modified_time(copy) < modified):
+                return False
+    return True
+
+
+def save_info(name, info):
+    """Записывает размеры и заглушку во все посты с картинкой name."""
+    Post.objects.filter(image=name).update(**info)
+
+
+def process_image(name):
+    """Задача очереди: нормализует картинку и сохраняет её копии."""
+    info = render(name)
+    if info is not None:
+        save_info(name, info)
+        logger.info(
+            'Обработана картинка %s (%sx%s)',
+            name, info['image_width'], info['image_height'],
+        )
+
+
+def delete_renditions(name):
+    """Удаляет копии картинки всех форматов и ширин."""
+    files = storage()
+    directory = rendition_dir(name)
+    if not files.exists(directory):
+        return
+    for file in files.listdir(directory)[1]:
+        files.delete(f'{directory}/{file}')
@@ -0,0 +1,50 @@
+# posts/live.py
+"""События для живого обновления страниц (core.pubsub).
+
+Новый пост публикуется в канал автора: поток ленты подписок
+слушает каналы всех авторов, на которых подписан пользователь.
+Новый комментарий публикуется в канал поста.
+"""
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import Truncator
+
+from core import pubsub
+
+from .models import Follow
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def comments_channel(post_id):
+    return f'post:{post_id}:comments'
+
+
+def post_published(post):
+    pubsub.publish(author_channel(post.author_id), {
+        'id': post.pk,
+        'author': post.author.get_full_name() or post.author.username,
+        'text': Truncator(post.text).chars(settings.LIVE_SUMMARY_LENGTH),
+        'pub_date': post.pub_date,
+        'url': reverse('posts:post_detail', args=[post.pk]),
+    })
+
+
+def comment_added(comment):
+    pubsub.publish(comments_channel(comment.post_id), {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    })
+
+
+def follow_channels(user):
+    """Каналы авторов, на которых подписан пользователь."""
+    return [
+        author_channel(author_id) for author_id in Follow.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True)
+    ]
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Генерирует карту сайта по частям в SITEMAP_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Перегенерировать все части, а не только изменившиеся',
+        )
+
+    def handle(self, *args, **options):
+        numbers = sitemaps.build(full=options['full'])
+        self.stdout.write(f'Перегенерировано частей: {len(numbers)}')
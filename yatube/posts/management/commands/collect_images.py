@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import dedup
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки постов, на которые больше нет ссылок'
+
+    def handle(self, *args, **options):
+        deleted = dedup.collect()
+        self.stdout.write(f'Удалено файлов: {deleted}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Удаляет затухшие записи рейтинга популярных постов'
+
+    def handle(self, *args, **options):
+        deleted = trending.compact()
+        self.stdout.write(f'Удалено записей рейтинга: {deleted}')
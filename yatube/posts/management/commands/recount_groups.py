@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import groups
+from posts.models import Group
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число постов и дату последнего поста групп'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Слаги групп (все)')
+
+    def handle(self, *args, **options):
+        selected = Group.objects.all()
+        if options['slugs']:
+            selected = selected.filter(slug__in=options['slugs'])
+        self.stdout.write(f'Пересчитано групп: {groups.recount(selected)}')
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from posts import images, thumbnails
+from posts.models import Group, Post, User
+
+# Сколько последних имён помнить, чтобы не обрабатывать общую
+# картинку повторно; более давний повтор отсеет up_to_date
+SEEN_LIMIT = 10000
+
+
+def regenerate(task):
+    """Обработка одной картинки в процессе пула.
+
+    Возвращает (имя, поля поста из images.render или None, пропущена
+    ли, текст ошибки или None). Поля в посты записывает родительский
+    процесс, чтобы не писать в базу из многих процессов сразу.
+    """
+    name, width, force = task
+    try:
+        info = None
+        skipped = True
+        if force or not images.up_to_date(name, width):
+            info = images.render(name)
+            skipped = False
+        if force or not thumbnails.exists(name):
+            thumbnails.get_thumbnail(name)
+            skipped = False
+        return name, info, skipped, None
+    except Exception as error:
+        return name, None, False, f'{type(error).__name__}: {error}'
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт копии и миниатюры картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=self.date, help='Посты не раньше даты ГГГГ-ММ-ДД'
+        )
+        parser.add_argument(
+            '--until', type=self.date, help='Посты раньше даты ГГГГ-ММ-ДД'
+        )
+        parser.add_argument('--group', help='Слаг группы')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать и те картинки, что уже актуальны',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов (по умолчанию - число ядер)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    @staticmethod
+    def date(value):
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+
+    def queryset(self, options):
+        posts = Post.objects.exclude(image='')
+        if options['since']:
+            posts = posts.filter(pub_date__gte=options['since'])
+        if options['until']:
+            posts = posts.filter(pub_date__lt=options['until'])
+        if options['group']:
+            try:
+                group = Group.objects.get(slug=options['group'])
+            except Group.DoesNotExist:
+                raise CommandError(f'Нет группы {options["group"]}')
+            posts = posts.filter(group=group)
+        if options['author']:
+            try:
+                author = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(f'Нет автора {options["author"]}')
+            posts = posts.filter(author=author)
+        return posts.order_by('pk')
+
+    def batches(self, posts, batch_size, force):
+        """Списки задач по порциям постов, без недавних повторов.
+
+        Запросы выполняются в основном потоке: пул получает уже
+        готовый список, а не генератор, который он читал бы из
+        своего потока через общее соединение с базой.
+        """
+        seen = OrderedDict()
+        last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk).values_list(
+                    'pk', 'image', 'image_width', 'image_placeholder'
+                )[:batch_size]
+            )
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            tasks = []
+            for _, name, width, placeholder in batch:
+                if name in seen:
+                    continue
+                seen[name] = True
+                if len(seen) > SEEN_LIMIT:
+                    seen.popitem(last=False)
+                # Посты, обработанные до появления заглушек,
+                # считаются необработанными
+                tasks.append((name, width if placeholder else None, force))
+            yield tasks
+
+    def handle(self, *args, **options):
+        batches = self.batches(
+            self.queryset(options), options['batch_size'], options['force']
+        )
+        processes = max(options['processes'] or 1, 1)
+        started = time.monotonic()
+        done = skipped = failed = 0
+        pool = None
+        if processes > 1:
+            # Дочерние процессы откроют собственные соединения
+            connections.close_all()
+            pool = multiprocessing.Pool(processes)
+        try:
+            for tasks in batches:
+                if pool is None:
+                    results = map(regenerate, tasks)
+                else:
+                    results = pool.imap_unordered(
+                        regenerate, tasks, chunksize=4
+                    )
+                for name, info, was_skipped, error in results:
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f'{name}: {error}')
+                        continue
+                    if info is not None:
+                        images.save_info(name, info)
+                    if was_skipped:
+                        skipped += 1
+                    else:
+                        done += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Обработано картинок: {done}, пропущено: {skipped}, '
+            f'ошибок: {failed} за {elapsed:.1f} с ({rate:.1f} изобр./с)'
+        )
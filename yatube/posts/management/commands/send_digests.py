@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.digest import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Рассылает подписчикам дайджесты новых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-users',
+            type=int,
+            default=settings.DIGEST_MAX_PER_RUN,
+            help='Наибольшее число получателей за прогон',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.DIGEST_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        metrics = send_digests(
+            max_users=options['max_users'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            'Получателей: {users}, писем: {emails}, постов: {posts}, '
+            '{seconds:.2f} с, {emails_per_second:.1f} писем/с'.format(
+                **metrics
+            )
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapChunk',
+            fields=[
+                ('number', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Номер части')),
+                ('dirty', models.BooleanField(default=True, verbose_name='Требует перегенерации')),
+                ('urls', models.PositiveIntegerField(default=0, verbose_name='Количество адресов')),
+                ('lastmod', models.DateTimeField(blank=True, null=True, verbose_name='Дата последнего изменения')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+    ]
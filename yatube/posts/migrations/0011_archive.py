@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_sitemapchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов в архиве')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchiveState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_post_id', models.PositiveIntegerField(default=0, verbose_name='Наибольший id архивного поста')),
+                ('archived_posts', models.PositiveIntegerField(default=0, verbose_name='Перенесено постов')),
+                ('archived_comments', models.PositiveIntegerField(default=0, verbose_name='Перенесено комментариев')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+        ),
+    ]
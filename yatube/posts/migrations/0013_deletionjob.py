@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('target', models.CharField(choices=[('user', 'Пользователь'), ('post', 'Пост'), ('group', 'Группа')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('description', models.CharField(blank=True, max_length=200, verbose_name='Объект')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершено')], default='queued', max_length=10, verbose_name='Статус')),
+                ('stage', models.CharField(blank=True, max_length=50, verbose_name='Этап')),
+                ('deleted_posts', models.PositiveIntegerField(default=0, verbose_name='Удалено постов')),
+                ('deleted_comments', models.PositiveIntegerField(default=0, verbose_name='Удалено комментариев')),
+                ('deleted_follows', models.PositiveIntegerField(default=0, verbose_name='Удалено подписок')),
+                ('deleted_files', models.PositiveIntegerField(default=0, verbose_name='Удалено файлов')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_explicit_query_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='uploaded',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Загружен'),
+        ),
+    ]
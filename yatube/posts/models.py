@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 from core.models import CreatedModel
+from core.querycache import CachingManager, InvalidatingManager
+
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -9,6 +12,23 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    # Агрегаты поддерживаются сигналами Post, а не считаются в запросе
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    last_post_date = models.DateTimeField(
+        'Дата последнего поста',
+        blank=True,
+        null=True
+    )
+
+    objects = InvalidatingManager()
+    # Кешированные выборки - только в горячих местах (core.querycache)
+    cached = CachingManager()
+
+    class Meta:
+        base_manager_name = 'objects'
 
     def __str__(self):
         return self.title
@@ -21,7 +41,10 @@ class Post(models.Model):
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True)
+        auto_now_add=True,
+        db_index=True)
+    # Дата последнего изменения - lastmod в карте сайта
+    updated = models.DateTimeField('Дата обновления', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,11 +64,43 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
+        blank=True
+    )
+    # Размеры обработанной картинки (posts.images), пусто до обработки
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True
+    )
+    # Заглушка на время загрузки картинки: крошечная копия в data URI
+    # и средний цвет
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
         blank=True
     )
+    image_color = models.CharField(
+        'Цвет картинки',
+        max_length=7,
+        blank=True
+    )
+
+    objects = InvalidatingManager()
+    cached = CachingManager()
 
     class Meta:
+        base_manager_name = 'objects'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['group', '-pub_date']),
+            # Непрочитанные посты подписок (posts.unread)
+            models.Index(fields=['author', 'id']),
+        ]
 
     def __str__(self):
         return self.text
@@ -70,6 +125,12 @@ class Comment(CreatedModel):
         verbose_name='Поле для комментария'
     )
 
+    objects = InvalidatingManager()
+    cached = CachingManager()
+
+    class Meta:
+        base_manager_name = 'objects'
+
     def __str__(self):
         return self.title
 
@@ -85,3 +146,213 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    objects = InvalidatingManager()
+    cached = CachingManager()
+
+    class Meta:
+        base_manager_name = 'objects'
+
+
+class FeedMarker(models.Model):
+    """Последний пост ленты подписок, который видел пользователь.
+
+    Посты подписок с большим id считаются непрочитанными.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_marker'
+    )
+    last_seen_id = models.PositiveIntegerField(
+        'Последний просмотренный пост',
+        default=0
+    )
+    updated = models.DateTimeField('Дата обновления', auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.last_seen_id}'
+
+
+class TrendingScore(models.Model):
+    """Затухающий рейтинг поста для вкладки «Популярное».
+
+    Хранится логарифм суммы весов событий, умноженных на
+    exp(t / tau), поэтому порядок по score совпадает с порядком
+    по текущему (затухшему) рейтингу и не требует пересчёта.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    score = models.FloatField('Рейтинг', db_index=True)
+    updated = models.DateTimeField('Дата обновления', auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score}'
+
+
+class SitemapChunk(models.Model):
+    """Часть карты сайта: посты с id в диапазоне
+    (number * SITEMAP_CHUNK_SIZE, (number + 1) * SITEMAP_CHUNK_SIZE]."""
+    number = models.PositiveIntegerField('Номер части', primary_key=True)
+    dirty = models.BooleanField('Требует перегенерации', default=True)
+    urls = models.PositiveIntegerField('Количество адресов', default=0)
+    lastmod = models.DateTimeField(
+        'Дата последнего изменения',
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        ordering = ['number']
+
+    def __str__(self):
+        return f'sitemap-{self.number}.xml'
+
+
+class ArchiveState(models.Model):
+    """Состояние архива старых постов (единственная запись).
+
+    max_post_id позволяет не обращаться к архивной базе
+    за постами, которые заведомо в неё не переносились.
+    """
+    max_post_id = models.PositiveIntegerField(
+        'Наибольший id архивного поста',
+        default=0
+    )
+    archived_posts = models.PositiveIntegerField(
+        'Перенесено постов',
+        default=0
+    )
+    archived_comments = models.PositiveIntegerField(
+        'Перенесено комментариев',
+        default=0
+    )
+    updated = models.DateTimeField('Дата обновления', auto_now=True)
+
+    def __str__(self):
+        return f'Архив до поста {self.max_post_id}'
+
+
+class ArchivedAuthor(models.Model):
+    """Количество архивных постов автора."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='archive_stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Постов в архиве',
+        default=0
+    )
+
+    def __str__(self):
+        return f'{self.author_id}: {self.posts_count}'
+
+
+class PostEvent(models.Model):
+    """Событие «автор опубликовал пост» для рассылки дайджестов."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='events'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='post_events'
+    )
+
+    def __str__(self):
+        return f'{self.author_id}: {self.post_id}'
+
+
+class DigestState(models.Model):
+    """Прогресс рассылки дайджестов (единственная запись).
+
+    События с id до last_event_id разосланы. Текущее окно
+    (last_event_id, window_end_id] рассылается подписчикам
+    по возрастанию id; last_user_id - последний обработанный.
+    """
+    last_event_id = models.PositiveIntegerField(default=0)
+    window_end_id = models.PositiveIntegerField(default=0)
+    last_user_id = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Дайджесты до события {self.last_event_id}'
+
+
+class DeletionJob(CreatedModel):
+    """Фоновое удаление объекта с зависимыми записями по частям."""
+    USER = 'user'
+    POST = 'post'
+    GROUP = 'group'
+    TARGETS = (
+        (USER, 'Пользователь'),
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+    )
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    target = models.CharField('Тип объекта', max_length=10, choices=TARGETS)
+    object_id = models.PositiveIntegerField('id объекта')
+    description = models.CharField('Объект', max_length=200, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    stage = models.CharField('Этап', max_length=50, blank=True)
+    deleted_posts = models.PositiveIntegerField('Удалено постов', default=0)
+    deleted_comments = models.PositiveIntegerField(
+        'Удалено комментариев',
+        default=0
+    )
+    deleted_follows = models.PositiveIntegerField(
+        'Удалено подписок',
+        default=0
+    )
+    deleted_files = models.PositiveIntegerField('Удалено файлов', default=0)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    finished = models.DateTimeField('Завершено', blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.get_target_display()} {self.object_id}: {self.stage}'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище по хешу содержимого (posts.storage).
+
+    refcount - число постов, ссылающихся на файл; файл без ссылок
+    удаляет posts.dedup.collect. uploaded - время последней загрузки
+    файла с таким содержимым: пост, который на него сошлётся, может
+    быть ещё не сохранён.
+    """
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refcount = models.IntegerField('Число ссылок', default=0, db_index=True)
+    uploaded = models.DateTimeField('Загружен', blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.refcount}'
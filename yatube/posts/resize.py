@@ -0,0 +1,218 @@
+# posts/resize.py
+"""Уменьшение картинок постов по подписанной ссылке.
+
+Ссылка содержит размер (spec: «960x339c», c - обрезка по центру)
+и подпись пары размер-файл, поэтому произвольные размеры
+запросить нельзя. Картинка считается в пуле из RESIZE_THREADS
+потоков; если в очереди уже RESIZE_QUEUE_SIZE задач, запрос
+отклоняется, а не ждёт. Результат сохраняется в RESIZE_CACHE_ROOT;
+при превышении RESIZE_CACHE_MAX_SIZE удаляются файлы, которые
+дольше всех не запрашивались.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from . import images
+
+SPEC_RE = re.compile(r'^(?P<width>\d+)x(?P<height>\d+)(?P<crop>c?)$')
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+_cache_size = None
+
+
+class Busy(Exception):
+    """Очередь уменьшения картинок заполнена."""
+
+
+class Timeout(Busy):
+    """Картинка не уменьшена за RESIZE_TIMEOUT секунд."""
+
+
+class Unreadable(Exception):
+    """Файла нет или его нельзя прочитать как картинку."""
+
+
+def _signer():
+    return signing.Signer(salt='posts.resize')
+
+
+def make_spec(width, height, crop=False):
+    return f'{width}x{height}{"c" if crop else ""}'
+
+
+def parse_spec(spec):
+    """(ширина, высота, обрезка) или ValueError."""
+    match = SPEC_RE.match(spec)
+    if match is None:
+        raise ValueError(spec)
+    width, height = int(match['width']), int(match['height'])
+    if not (0 < width <= settings.RESIZE_MAX_SIZE
+            and 0 < height <= settings.RESIZE_MAX_SIZE):
+        raise ValueError(spec)
+    return width, height, bool(match['crop'])
+
+
+def sign(spec, name):
+    return _signer().signature(f'{spec}:{name}')
+
+
+def check_signature(spec, name, signature):
+    return signing.constant_time_compare(signature, sign(spec, name))
+
+
+def resize_url(name, width, height, crop=False):
+    spec = make_spec(width, height, crop)
+    return reverse('resize', args=[spec, sign(spec, name), name])
+
+
+def thumbnail_url(name):
+    """Ссылка на миниатюру поста размера POST_THUMBNAIL_GEOMETRY."""
+    width, height = map(int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    crop = bool(settings.POST_THUMBNAIL_OPTIONS.get('crop'))
+    return resize_url(name, width, height, crop)
+
+
+def cache_path(spec, name):
+    digest = hashlib.sha1(f'{spec}:{name}'.encode()).hexdigest()
+    return os.path.join(settings.RESIZE_CACHE_ROOT, digest[:2], digest)
+
+
+def render(name, width, height, crop):
+    """Уменьшенная картинка: (байты, MIME-тип)."""
+    with images.storage().open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if crop:
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        image.thumbnail((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue(), 'image/png'
+    image.convert('RGB').save(
+        buffer, 'JPEG', quality=settings.IMAGE_QUALITY, optimize=True
+    )
+    return buffer.getvalue(), 'image/jpeg'
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.RESIZE_THREADS, thread_name_prefix='resize'
+            )
+            _slots = threading.BoundedSemaphore(
+                settings.RESIZE_THREADS + settings.RESIZE_QUEUE_SIZE
+            )
+    return _executor, _slots
+
+
+def _store(path, content, content_type):
+    global _cache_size
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # MIME-тип записывается рядом последним: по нему get()
+    # узнаёт, что картинка сохранена целиком
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(content)
+    os.replace(tmp, path)
+    with open(tmp, 'w') as file:
+        file.write(content_type)
+    os.replace(tmp, f'{path}.type')
+    with _lock:
+        if _cache_size is None:
+            _cache_size = _scan_size()
+        _cache_size += len(content)
+        if _cache_size > settings.RESIZE_CACHE_MAX_SIZE:
+            _cache_size = evict(settings.RESIZE_CACHE_MAX_SIZE * 0.9)
+
+
+def _scan():
+    root = settings.RESIZE_CACHE_ROOT
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if file.endswith(('.type', '.tmp')):
+                continue
+            path = os.path.join(directory, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_atime, stat.st_size
+
+
+def _scan_size():
+    return sum(size for _, _, size in _scan())
+
+
+def evict(limit):
+    """Удаляет давно не запрашивавшиеся файлы; возвращает новый размер."""
+    files = sorted(_scan(), key=lambda item: item[1])
+    total = sum(size for _, _, size in files)
+    for path, _, size in files:
+        if total <= limit:
+            break
+        for victim in (path, f'{path}.type'):
+            try:
+                os.remove(victim)
+            except FileNotFoundError:
+                pass
+        total -= size
+    return total
+
+
+def get(spec, name):
+    """Путь к уменьшенной картинке и её MIME-тип.
+
+    Отсутствующая в кеше картинка считается в пуле потоков;
+    если пул перегружен, выбрасывается Busy, если картинка не
+    посчитана за RESIZE_TIMEOUT - Timeout, а если файла нет или
+    это не картинка - Unreadable.
+    """
+    path = cache_path(spec, name)
+    try:
+        with open(f'{path}.type') as file:
+            content_type = file.read()
+        # Отметка последнего обращения - время доступа; время
+        # изменения не трогаем, от него зависят ETag и Last-Modified
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+        return path, content_type
+    except FileNotFoundError:
+        pass
+    width, height, crop = parse_spec(spec)
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise Busy
+    try:
+        future = executor.submit(render, name, width, height, crop)
+    except Exception:
+        slots.release()
+        raise
+    # Место в очереди освобождается, когда картинка посчитана,
+    # даже если запрос перестал её ждать
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        content, content_type = future.result(settings.RESIZE_TIMEOUT)
+    except FutureTimeout:
+        raise Timeout(name)
+    except (OSError, Image.DecompressionBombError) as error:
+        # В том числе FileNotFoundError и UnidentifiedImageError
+        raise Unreadable(name) from error
+    _store(path, content, content_type)
+    return path, content_type
@@ -0,0 +1,34 @@
+# posts/routers.py
+ARCHIVE_DB = 'archive'
+ARCHIVED_MODELS = {'posts.post', 'posts.comment'}
+
+
+class ArchiveRouter:
+    """Направляет запросы к архивной базе.
+
+    Посты и комментарии, загруженные из архива, продолжают
+    работать с архивом (например, post.comments), а связанные
+    пользователи и группы всегда читаются из основной базы.
+    """
+
+    def _db_for(self, model, hints):
+        instance = hints.get('instance')
+        if (
+            model._meta.label_lower in ARCHIVED_MODELS
+            and instance is not None
+            and instance._state.db == ARCHIVE_DB
+        ):
+            return ARCHIVE_DB
+        return 'default'
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
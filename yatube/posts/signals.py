@@ -0,0 +1,166 @@
+# posts/signals.py
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import lookups
+
+from core.tasks import enqueue_on_commit
+
+from . import (dedup, digest, groups, images, live, sitemaps, thumbnails,
+               trending, unread)
+from .models import Comment, Follow, Group, Post, User
+
+lookups.register(Group, 'slug')
+lookups.register(User, 'username')
+
+
+@receiver(pre_save, sender=Post)
+def remember_loaded(sender, instance, **kwargs):
+    # Прежние группа и картинка нужны только при сохранении,
+    # поэтому читаем их здесь, а не при каждой загрузке поста
+    loaded = None
+    if not instance._state.adding:
+        loaded = Post._base_manager.using(instance._state.db).filter(
+            pk=instance.pk
+        ).values('group_id', 'image').first()
+    instance._loaded_group_id = loaded['group_id'] if loaded else None
+    instance._loaded_image = loaded['image'] if loaded else None
+
+
+@receiver(post_save, sender=Post)
+def post_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.bump(
+            instance.pk, settings.TRENDING_POST_WEIGHT, instance.pub_date
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_group_stats(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._loaded_group_id
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            groups.remove_post(old_group_id, instance.pub_date)
+        if instance.group_id is not None:
+            groups.add_post(instance.group_id, instance.pub_date)
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_group_stats(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        groups.remove_post(instance.group_id, instance.pub_date)
+
+
+@receiver(post_save, sender=Post)
+def post_sitemap(sender, instance, **kwargs):
+    # Правка меняет lastmod, поэтому часть перегенерируется всегда
+    sitemaps.mark_dirty(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_sitemap(sender, instance, **kwargs):
+    sitemaps.mark_dirty(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_digest_event(sender, instance, created, **kwargs):
+    if created:
+        digest.record_new_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_unread(sender, instance, created, **kwargs):
+    if created:
+        unread.record_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_unread(sender, instance, **kwargs):
+    unread.forget_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_unread(sender, instance, **kwargs):
+    unread.forget_follows(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def post_live_event(sender, instance, created, **kwargs):
+    if created:
+        live.post_published(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_live_event(sender, instance, created, **kwargs):
+    if created:
+        live.comment_added(instance)
+
+
+def _collect_later(name):
+    # Свежие загрузки collect() пропускает: задача ждёт, пока
+    # истечёт IMAGE_GC_GRACE, иначе файл остался бы до ручной сборки
+    enqueue_on_commit(
+        dedup.collect, [name],
+        dedup_key=f'collect:{name}', delay=settings.IMAGE_GC_GRACE,
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_image_references(sender, instance, **kwargs):
+    if 'image' not in instance.__dict__:
+        return
+    name = instance.image.name
+    old = instance._loaded_image or None
+    if name == old:
+        return
+    if name:
+        dedup.acquire(name)
+    if old and dedup.release(old):
+        _collect_later(old)
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_image_references(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and dedup.release(name):
+        _collect_later(name)
+
+
+@receiver(post_save, sender=Post)
+def post_process_image(sender, instance, **kwargs):
+    if 'image' not in instance.__dict__:
+        return
+    name = instance.image.name
+    if name and name != instance._loaded_image:
+        # Такой же файл уже загружали: копии, размеры и заглушка готовы
+        info = Post.objects.filter(
+            image=name, image_width__isnull=False
+        ).order_by('pk').values(*images.INFO_FIELDS).first()
+        if info is not None:
+            images.save_info(name, info)
+        else:
+            enqueue_on_commit(
+                images.process_image, name, dedup_key=f'image:{name}'
+            )
+            # Миниатюра нужна ленте, пока нет копий для srcset
+            enqueue_on_commit(
+                thumbnails.warm, name, dedup_key=f'thumbnail:{name}'
+            )
+
+
+@receiver(post_save, sender=Comment)
+def comment_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.bump(
+            instance.post_id,
+            settings.TRENDING_COMMENT_WEIGHT,
+            instance.created
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_choices_changed(sender, **kwargs):
+    groups.forget_group_choices()
@@ -0,0 +1,141 @@
+# posts/sitemaps.py
+import heapq
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Max
+from django.urls import reverse
+
+from .models import ArchiveState, Post, SitemapChunk
+from .routers import ARCHIVE_DB
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def chunk_number(post_id):
+    return (post_id - 1) // settings.SITEMAP_CHUNK_SIZE
+
+
+def chunk_path(number):
+    return os.path.join(settings.SITEMAP_ROOT, f'sitemap-{number}.xml')
+
+
+def index_path():
+    return os.path.join(settings.SITEMAP_ROOT, 'sitemap.xml')
+
+
+def mark_dirty(post_id):
+    """Помечает часть, в которую попадает пост, для перегенерации."""
+    SitemapChunk.objects.filter(
+        number=chunk_number(post_id), dirty=False
+    ).update(dirty=True)
+
+
+def _absolute(path):
+    return escape(settings.SITEMAP_BASE_URL.rstrip('/') + path)
+
+
+def _write_atomic(path, lines):
+    """Пишет файл во временный и подменяет им старый целиком."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            tmp.writelines(lines)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _chunk_lines(rows, stats):
+    yield XML_HEADER
+    yield f'<urlset xmlns="{XMLNS}">\n'
+    for pk, updated in rows:
+        stats['urls'] += 1
+        if stats['lastmod'] is None or updated > stats['lastmod']:
+            stats['lastmod'] = updated
+        location = _absolute(reverse('posts:post_detail', args=[pk]))
+        yield (
+            f'<url><loc>{location}</loc>'
+            f'<lastmod>{updated.isoformat()}</lastmod></url>\n'
+        )
+    yield '</urlset>\n'
+
+
+def build_chunk(number):
+    """Генерирует одну часть, читая посты диапазоном по первичному ключу."""
+    size = settings.SITEMAP_CHUNK_SIZE
+    sources = [Post.objects.all()]
+    # Архивные посты по-прежнему открываются на post_detail
+    if ArchiveState.objects.filter(
+        archived_posts__gt=0, max_post_id__gt=number * size
+    ).exists():
+        sources.append(Post.objects.using(ARCHIVE_DB).all())
+    sources = [
+        posts.filter(
+            pk__gt=number * size, pk__lte=(number + 1) * size
+        ).order_by('pk')
+        for posts in sources
+    ]
+    stats = {'urls': 0, 'lastmod': None}
+    if any(posts.exists() for posts in sources):
+        rows = heapq.merge(*(
+            posts.values_list('pk', 'updated').iterator()
+            for posts in sources
+        ))
+        _write_atomic(chunk_path(number), _chunk_lines(rows, stats))
+    elif os.path.exists(chunk_path(number)):
+        # Все посты части удалены
+        os.remove(chunk_path(number))
+    SitemapChunk.objects.update_or_create(
+        number=number,
+        defaults={'dirty': False, **stats}
+    )
+
+
+def build_index():
+    chunks = SitemapChunk.objects.filter(urls__gt=0)
+    lines = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">\n']
+    for chunk in chunks:
+        location = _absolute(
+            reverse('sitemap_chunk', args=[chunk.number])
+        )
+        lines.append(
+            f'<sitemap><loc>{location}</loc>'
+            f'<lastmod>{chunk.lastmod.isoformat()}</lastmod></sitemap>\n'
+        )
+    lines.append('</sitemapindex>\n')
+    _write_atomic(index_path(), lines)
+
+
+def build(full=False):
+    """Перегенерирует изменившиеся части и индекс.
+
+    Новые части (диапазоны id за пределами известных) считаются
+    изменившимися. Возвращает список перегенерированных номеров.
+    """
+    max_id = Post.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+    archived = ArchiveState.objects.values_list(
+        'max_post_id', flat=True
+    ).first()
+    max_id = max(max_id, archived or 0)
+    last = chunk_number(max_id) if max_id else -1
+    known = set(SitemapChunk.objects.values_list('number', flat=True))
+    SitemapChunk.objects.bulk_create([
+        SitemapChunk(number=number)
+        for number in range(last + 1) if number not in known
+    ])
+    chunks = SitemapChunk.objects.all()
+    if not full:
+        chunks = chunks.filter(dirty=True)
+    numbers = list(chunks.values_list('number', flat=True))
+    for number in numbers:
+        build_chunk(number)
+    if numbers or not os.path.exists(index_path()):
+        build_index()
+    return numbers
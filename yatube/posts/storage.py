@@ -0,0 +1,88 @@
+# posts/storage.py
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хеш его содержимого.
+
+    Загрузка хешируется по частям во время записи во временный
+    файл; одинаковые картинки получают одно имя
+    (posts/ab/ab12….jpg) и хранятся один раз, поэтому общими
+    оказываются и их миниатюры. Ссылки на файл считает
+    posts.dedup.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Окончательное имя зависит от содержимого и выбирается в _save
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path(directory), suffix='.tmp')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            path = self.path(name)
+            # Отметка до проверки файла: сборщик мусора либо увидит
+            # её и не тронет файл, либо закончит удаление раньше
+            self.claim(name)
+            if os.path.exists(path):
+                os.remove(tmp)
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return name
+
+    def claim(self, name):
+        """Отмечает загрузку name до записи файла (см. posts.dedup)."""
+        # Импорт здесь: модели сами импортируют это хранилище
+        from .dedup import claim
+        claim(name)
+
+    def save_as(self, name, content):
+        """Сохраняет файл точно под именем name, заменяя прежний.
+
+        Для производных файлов (копий картинки), имя которых
+        выводится из имени оригинала, а не из их содержимого.
+        Замена атомарна: читатель видит старый или новый файл.
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp, self.file_permissions_mode)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name
+
+
+image_storage = ContentAddressedStorage()
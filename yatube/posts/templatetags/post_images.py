@@ -0,0 +1,59 @@
+from django import template
+from django.conf import settings
+
+from posts import images, resize, thumbnails
+
+register = template.Library()
+
+
+def _preloaded(context, post):
+    """Миниатюры всех необработанных картинок страницы, один раз."""
+    page_obj = context.get('page_obj')
+    if page_obj is None:
+        return thumbnails.preload([post])
+    if not hasattr(page_obj, 'preloaded_thumbnails'):
+        page_obj.preloaded_thumbnails = thumbnails.preload(
+            post for post in page_obj if not post.image_width
+        )
+    return page_obj.preloaded_thumbnails
+
+
+def _thumbnail(context, post):
+    name = post.image.name
+    thumbnail = _preloaded(context, post).get(name)
+    if thumbnail is not None:
+        return {
+            'url': thumbnail.url,
+            'width': thumbnail.width,
+            'height': thumbnail.height,
+        }
+    # Миниатюры ещё нет (её создаёт фоновая задача после
+    # загрузки): отдаём её по ссылке на уменьшение
+    width, height = map(int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    crop = settings.POST_THUMBNAIL_OPTIONS.get('crop')
+    return {
+        'url': resize.thumbnail_url(name),
+        'width': width if crop else None,
+        'height': height if crop else None,
+    }
+
+
+@register.inclusion_tag('posts/includes/post_image.html', takes_context=True)
+def post_image(context, post, lazy=True):
+    """Картинка поста: <picture> со srcset или миниатюра.
+
+    lazy - загружать картинку, только когда она близко к экрану;
+    до этого на её месте видна заглушка из поста.
+    """
+    sources = images.renditions(post)
+    thumbnail = None
+    if post.image and not sources:
+        thumbnail = _thumbnail(context, post)
+    return {
+        'post': post,
+        'sources': sources[:-1],
+        'fallback': sources[-1] if sources else None,
+        'thumbnail': thumbnail,
+        'sizes': settings.IMAGE_SIZES,
+        'lazy': lazy,
+    }
@@ -0,0 +1,84 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.paginator import EstimatedCountPaginator
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {num}', slug=f'group-{num}', description='-'
+            )
+            for num in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count):
+        for num in range(count):
+            user = User.objects.create_user(
+                username=f'user{User.objects.count()}'
+            )
+            post = Post.objects.create(
+                author=user, text='Текст', group=self.groups[num % 3]
+            )
+            Comment.objects.create(post=post, author=user, text='Текст')
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        '''Число запросов списка не зависит от числа строк'''
+        for url in ('/admin/posts/post/', '/admin/posts/comment/'):
+            with self.subTest(url=url):
+                self.add_posts(2)
+                cache.clear()
+                few = self.changelist_queries(url)
+                self.add_posts(8)
+                cache.clear()
+                self.assertEqual(self.changelist_queries(url), few)
+
+    def test_group_choices_cached(self):
+        '''Список групп для list_editable берётся из кеша'''
+        self.add_posts(3)
+        self.client.get('/admin/posts/post/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/admin/posts/post/')
+        self.assertFalse(
+            any('FROM "posts_group"' in query['sql']
+                and '"posts_post"' not in query['sql']
+                for query in queries)
+        )
+        Group.objects.create(title='Новая', slug='new', description='-')
+        response = self.client.get('/admin/posts/post/')
+        self.assertContains(response, 'Новая')
+
+    def test_estimated_count(self):
+        '''Без фильтров размер таблицы оценивается по первичному ключу'''
+        self.add_posts(3)
+        Post.objects.filter(pk=Post.objects.first().pk).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, Post.objects.latest('pk').pk)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(group=self.groups[0]), 10
+        )
+        self.assertEqual(filtered.count, 1)
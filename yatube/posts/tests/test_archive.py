@@ -0,0 +1,134 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import archive, sitemaps
+from posts.models import Comment, Group, Post, SitemapChunk
+from posts.routers import ARCHIVE_DB
+
+User = get_user_model()
+
+TEMP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    ARCHIVE_AFTER_DAYS=30, ARCHIVE_BATCH_SIZE=2, SITEMAP_ROOT=TEMP_ROOT
+)
+class ArchiveTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.old_posts = [
+            Post.objects.create(author=cls.user, text=f'Старый пост {num}')
+            for num in range(3)
+        ]
+        cls.new_post = Post.objects.create(author=cls.user, text='Свежий')
+        Post.objects.filter(
+            pk__in=[post.pk for post in cls.old_posts]
+        ).update(pub_date=timezone.now() - timedelta(days=60))
+        cls.comment = Comment.objects.create(
+            post=cls.old_posts[0], author=cls.user, text='Комментарий'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_ROOT, ignore_errors=True)
+
+    def test_archive_moves_old_posts_in_batches(self):
+        '''Старые посты и комментарии переносятся в архив порциями'''
+        self.assertEqual(archive.archive(max_batches=1), 2)
+        self.assertEqual(archive.archive(), 1)
+        self.assertEqual(archive.archive(), 0)
+        self.assertEqual(list(Post.objects.all()), [self.new_post])
+        self.assertEqual(Post.objects.using(ARCHIVE_DB).count(), 3)
+        self.assertEqual(Comment.objects.using(ARCHIVE_DB).count(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_archive_is_resumable(self):
+        '''Повторный перенос уже скопированных строк не дублирует их'''
+        Post.objects.using(ARCHIVE_DB).bulk_create([self.old_posts[0]])
+        archive.archive()
+        self.assertEqual(Post.objects.using(ARCHIVE_DB).count(), 3)
+        self.assertEqual(archive.get_state().archived_posts, 3)
+
+    def test_post_detail_reads_archive(self):
+        '''Архивный пост и его комментарии доступны на post_detail'''
+        archive.archive()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_posts[0].pk])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, self.old_posts[0].text)
+        self.assertContains(response, self.comment.text)
+
+    def test_profile_reads_archive(self):
+        '''В профиле архивные посты идут после свежих'''
+        archive.archive()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertEqual(response.context['number_of_posts'], 4)
+        page = list(response.context['page_obj'])
+        self.assertEqual(page[0], self.new_post)
+        self.assertEqual(len(page), 4)
+        self.assertEqual(page[1]._state.db, ARCHIVE_DB)
+
+    def test_archive_keeps_dates_and_side_data(self):
+        '''Перенос - не удаление: даты и карта сайта не меняются'''
+        loaded = Post.objects.get(pk=self.old_posts[0].pk)
+        sitemaps.build(full=True)
+        archive.archive()
+        copy = Post.objects.using(ARCHIVE_DB).get(pk=loaded.pk)
+        self.assertEqual(copy.pub_date, loaded.pub_date)
+        self.assertEqual(sitemaps.build(), [])
+        sitemaps.build(full=True)
+        self.assertEqual(
+            SitemapChunk.objects.get(
+                number=sitemaps.chunk_number(loaded.pk)
+            ).urls,
+            4,
+        )
+
+    def test_archived_post_without_author_or_group(self):
+        '''Удалённые в основной базе группа и автор не ломают страницу'''
+        group = Group.objects.create(title='Группа', slug='group')
+        other = User.objects.create_user(username='other')
+        Post.objects.filter(pk=self.old_posts[1].pk).update(group=group)
+        Post.objects.filter(pk=self.old_posts[2].pk).update(author=other)
+        Comment.objects.create(
+            post=self.old_posts[1], author=other, text='Чужой комментарий'
+        )
+        archive.archive()
+        Group.objects.filter(pk=group.pk).delete()
+        User.objects.filter(pk=other.pk).delete()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_posts[1].pk])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, 'Чужой комментарий')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_posts[2].pk])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_no_comment_form_for_archived_post(self):
+        archive.archive()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_posts[0].pk])
+        )
+        self.assertNotContains(
+            response,
+            reverse('posts:add_comment', args=[self.old_posts[0].pk]),
+        )
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts import dedup
+from posts.models import ImageBlob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_GC_GRACE=0)
+class ImageDedupTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Мем {num}',
+                image=SimpleUploadedFile(
+                    f'meme{num}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+            for num in range(2)
+        ]
+        self.name = self.posts[0].image.name
+
+    def test_identical_uploads_share_one_file(self):
+        '''Одинаковые загрузки хранятся одним файлом по хешу'''
+        self.assertEqual(self.posts[1].image.name, self.name)
+        self.assertRegex(self.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertEqual(ImageBlob.objects.get(name=self.name).refcount, 2)
+        directory = os.path.dirname(self.posts[0].image.path)
+        self.assertEqual(os.listdir(directory), [os.path.basename(self.name)])
+
+    def test_file_removed_with_last_reference(self):
+        '''Файл удаляется только вместе с последним постом'''
+        path = self.posts[0].image.path
+        self.posts[0].delete()
+        self.assertEqual(dedup.collect(), 0)
+        self.assertTrue(os.path.exists(path))
+        self.posts[1].delete()
+        self.assertEqual(dedup.collect(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_collect_repairs_counter(self):
+        '''Неверный счётчик исправляется по реальным ссылкам'''
+        ImageBlob.objects.filter(name=self.name).update(refcount=0)
+        self.assertEqual(dedup.collect(), 0)
+        self.assertEqual(ImageBlob.objects.get(name=self.name).refcount, 2)
+        self.assertTrue(os.path.exists(self.posts[0].image.path))
+
+    @override_settings(IMAGE_GC_GRACE=60)
+    def test_recent_upload_is_not_collected(self):
+        '''Файл, который только что загрузили снова, не удаляется'''
+        for post in self.posts:
+            post.delete()
+        ImageBlob.objects.update(uploaded=timezone.now() - timedelta(hours=1))
+        # Та же картинка загружена, но пост ещё не сохранён
+        Post.image.field.storage.save(
+            'posts/again.gif', SimpleUploadedFile('again.gif', SMALL_GIF)
+        )
+        self.assertEqual(dedup.collect(), 0)
+        self.assertTrue(os.path.exists(self.posts[0].image.path))
+
+    @override_settings(IMAGE_GC_GRACE=600)
+    def test_collect_waits_for_grace_period(self):
+        '''Сборка после удаления ставится в очередь с задержкой'''
+        with mock.patch('posts.signals.enqueue_on_commit') as enqueue:
+            for post in self.posts:
+                post.delete()
+        enqueue.assert_called_once_with(
+            dedup.collect, [self.name],
+            dedup_key=f'collect:{self.name}', delay=600,
+        )
+
+    @override_settings(IMAGE_GC_GRACE=600, MEDIA_SERVE_BACKEND=None)
+    def test_unreferenced_image_is_not_served(self):
+        '''Картинка удалённых постов недоступна ещё до сборки мусора'''
+        url = settings.MEDIA_URL + self.name
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response.close()
+        for post in self.posts:
+            post.delete()
+        self.assertTrue(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, self.name
+        )))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
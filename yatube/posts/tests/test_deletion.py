@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from posts import deletion
+from posts.models import (ArchiveState, Comment, DeletionJob, Follow, Group,
+                          Post)
+from posts.routers import ARCHIVE_DB
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    DELETION_BATCH_SIZE=2,
+    DELETION_BATCH_PAUSE=0,
+    IMAGE_GC_GRACE=0,
+)
+class ChunkedDeletionTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='prolific')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {num}', group=self.group
+            )
+            for num in range(5)
+        ]
+        self.image_post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+        Comment.objects.create(
+            post=self.image_post, author=self.user, text='Свой'
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+
+    def test_user_deleted_in_batches(self):
+        '''Пользователь и все зависимые записи удаляются по частям'''
+        image_path = self.image_post.image.path
+        job = deletion.schedule(DeletionJob.USER, self.user)
+        deletion.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertEqual(job.deleted_posts, 6)
+        self.assertEqual(job.deleted_comments, 6)
+        self.assertEqual(job.deleted_follows, 1)
+        self.assertEqual(job.deleted_files, 1)
+        self.assertFalse(User.objects.filter(username='prolific').exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(os.path.exists(image_path))
+
+    def test_job_is_resumable(self):
+        '''Повторный запуск продолжает прерванное удаление'''
+        job = deletion.schedule(DeletionJob.POST, self.posts[0])
+        Comment.objects.filter(post=self.posts[0]).delete()
+        deletion.run_job(job.pk)
+        deletion.run_job(job.pk)
+        self.assertFalse(Post.objects.filter(pk=self.posts[0].pk).exists())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_group_deletion_detaches_posts(self):
+        '''Удаление группы отвязывает посты порциями'''
+        job = deletion.schedule(DeletionJob.GROUP, self.group)
+        deletion.run_job(job.pk)
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_admin_action_schedules_job(self):
+        '''Действие админки ставит удаление в фоновую очередь'''
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        self.client.post('/admin/auth/user/', {
+            'action': 'schedule_user_deletion',
+            '_selected_action': [self.user.pk],
+        })
+        self.assertTrue(
+            DeletionJob.objects.filter(object_id=self.user.pk).exists()
+        )
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_group_deletion_detaches_archived_posts(self):
+        '''Архивные посты группы тоже отвязываются'''
+        # Перенос в архив копирует туда автора и группу
+        User.objects.using(ARCHIVE_DB).bulk_create([self.user])
+        Group.objects.using(ARCHIVE_DB).bulk_create([self.group])
+        archived = Post.objects.using(ARCHIVE_DB).create(
+            author_id=self.user.pk, text='Архивный', group_id=self.group.pk
+        )
+        ArchiveState.objects.create(pk=1, archived_posts=1)
+        deletion.run_job(deletion.schedule(DeletionJob.GROUP, self.group).pk)
+        archived.refresh_from_db()
+        self.assertIsNone(archived.group_id)
+        self.assertFalse(Group.objects.using(ARCHIVE_DB).exists())
+
+    @override_settings(DELETION_MAX_ATTEMPTS=2)
+    def test_failing_job_is_marked_failed(self):
+        '''Задание с постоянной ошибкой получает статус FAILED'''
+        job = deletion.schedule(DeletionJob.POST, self.posts[0])
+        handlers = {DeletionJob.POST: mock.Mock(side_effect=ValueError('x'))}
+        with mock.patch.dict(deletion.HANDLERS, handlers):
+            with self.assertRaises(ValueError):
+                deletion.run_job(job.pk)
+            job.refresh_from_db()
+            self.assertEqual(job.status, DeletionJob.QUEUED)
+            deletion.run_job(job.pk)
+            deletion.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('ValueError', job.last_error)
+        deletion.retry(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.QUEUED)
+
+    def test_admin_delete_view_schedules_job(self):
+        '''Стандартное удаление в админке тоже идёт через задание'''
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/')
+        actions = response.context['action_form'].fields['action'].choices
+        self.assertNotIn('delete_selected', dict(actions))
+        self.client.post(
+            f'/admin/posts/post/{self.posts[0].pk}/delete/', {'post': 'yes'}
+        )
+        self.assertTrue(
+            DeletionJob.objects.filter(object_id=self.posts[0].pk).exists()
+        )
+        self.assertTrue(Post.objects.filter(pk=self.posts[0].pk).exists())
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.digest import send_digests
+from posts.models import DigestState, Follow, Post, PostEvent
+
+User = get_user_model()
+
+
+@override_settings(
+    TASK_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    SITEMAP_BASE_URL='http://testserver/',
+)
+class DigestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{num}', email=f'reader{num}@example.com'
+            )
+            for num in range(3)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+        Follow.objects.create(user=cls.readers[0], author=cls.other_author)
+
+    def test_one_digest_per_follower(self):
+        '''Каждый подписчик получает одно письмо со всеми новыми постами'''
+        post = Post.objects.create(author=self.author, text='Первый пост')
+        Post.objects.create(author=self.other_author, text='Второй пост')
+        metrics = send_digests()
+        self.assertEqual(metrics['emails'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        first = next(
+            message for message in mail.outbox
+            if message.to == [self.readers[0].email]
+        )
+        self.assertIn('Первый пост', first.body)
+        self.assertIn('Второй пост', first.body)
+        self.assertIn(f'http://testserver/posts/{post.pk}/', first.body)
+        self.assertFalse(PostEvent.objects.exists())
+        # Повторный прогон ничего не отправляет
+        self.assertEqual(send_digests()['emails'], 0)
+
+    def test_cap_per_run_resumes(self):
+        '''Ограничение на прогон продолжает рассылку со следующего'''
+        Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(send_digests(max_users=2, batch_size=1)['users'], 2)
+        self.assertEqual(
+            DigestState.objects.get().last_user_id, self.readers[1].pk
+        )
+        self.assertEqual(send_digests(max_users=2)['users'], 1)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(reader.email for reader in self.readers)
+        )
+
+    def test_digest_queries_are_set_based(self):
+        '''Число запросов не зависит от числа подписчиков'''
+        DigestState.objects.create(pk=1)
+        Post.objects.create(author=self.author, text='Пост')
+        with CaptureQueriesContext(connection) as few:
+            send_digests()
+        for num in range(10):
+            reader = User.objects.create_user(
+                username=f'new{num}', email=f'new{num}@example.com'
+            )
+            Follow.objects.create(user=reader, author=self.author)
+        Post.objects.create(author=self.author, text='Ещё пост')
+        with CaptureQueriesContext(connection) as many:
+            send_digests()
+        self.assertEqual(len(mail.outbox), 3 + 13)
+        self.assertEqual(len(few), len(many))
@@ -0,0 +1,97 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class GroupStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Первая группа',
+            slug='first',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Вторая группа',
+            slug='second',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def stats(self, group):
+        group.refresh_from_db()
+        return group.posts_count, group.last_post_date
+
+    def test_create_and_delete_update_stats(self):
+        '''Создание и удаление поста меняют агрегаты группы'''
+        first = Post.objects.create(
+            author=self.user, text='Первый', group=self.group
+        )
+        second = Post.objects.create(
+            author=self.user, text='Второй', group=self.group
+        )
+        self.assertEqual(self.stats(self.group), (2, second.pub_date))
+        second.delete()
+        self.assertEqual(self.stats(self.group), (1, first.pub_date))
+        first.delete()
+        self.assertEqual(self.stats(self.group), (0, None))
+
+    def test_post_edit_moves_post_between_groups(self):
+        '''Смена группы в post_edit переносит пост в агрегатах'''
+        post = Post.objects.create(
+            author=self.user, text='Текст', group=self.group
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Текст', 'group': self.other_group.pk}
+        )
+        self.assertEqual(self.stats(self.group), (0, None))
+        self.assertEqual(self.stats(self.other_group), (1, post.pub_date))
+
+    def test_recount_command_repairs_drift(self):
+        '''Команда recount_groups исправляет расхождения агрегатов'''
+        post = Post.objects.create(
+            author=self.user, text='Текст', group=self.group
+        )
+        # Обновление мимо сигналов не трогает агрегаты
+        Post.objects.filter(pk=post.pk).update(group=self.other_group)
+        out = StringIO()
+        call_command('recount_groups', stdout=out)
+        self.assertIn('Пересчитано групп: 2', out.getvalue())
+        self.assertEqual(self.stats(self.group), (0, None))
+        self.assertEqual(self.stats(self.other_group), (1, post.pub_date))
+
+    def test_loading_posts_needs_no_receivers(self):
+        '''Прежняя группа читается при сохранении, а не при загрузке'''
+        post = Post.objects.create(
+            author=self.user, text='Текст', group=self.group
+        )
+        post = Post.objects.get(pk=post.pk)
+        self.assertFalse(hasattr(post, '_loaded_group_id'))
+
+    def test_group_index_page(self):
+        '''Каталог сообществ читает агрегаты без подсчёта постов'''
+        Post.objects.create(author=self.user, text='Текст', group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:group_index'))
+        self.assertFalse(
+            any('posts_post' in query['sql'] for query in queries)
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, self.group.title)
+        self.assertContains(response, 'Всего постов: 1')
@@ -0,0 +1,204 @@
+import io
+import shutil
+import tempfile
+import warnings
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images, thumbnails
+from posts.models import Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+# Тег Orientation = 6: картинку нужно повернуть на 90° по часовой
+ROTATED = 6
+
+
+def photo(width, height):
+    image = Image.new('RGB', (width, height), 'red')
+    exif = image.getexif()
+    exif[0x0112] = ROTATED
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_MAX_SIZE=1000,
+    IMAGE_RENDITION_WIDTHS=(200, 400),
+    IMAGE_RENDITION_FORMATS=('jpeg',),
+)
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', image=photo(1200, 600)
+        )
+
+    def test_processing_is_queued_for_new_image(self):
+        '''Обработка ставится в очередь только при смене картинки'''
+        with mock.patch('posts.signals.enqueue_on_commit') as enqueue:
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=photo(100, 100)
+            )
+            post = Post.objects.get(pk=post.pk)
+            post.text = 'Правка'
+            post.save()
+        name = post.image.name
+        self.assertEqual(enqueue.call_args_list, [
+            mock.call(images.process_image, name, dedup_key=f'image:{name}'),
+            mock.call(thumbnails.warm, name, dedup_key=f'thumbnail:{name}'),
+        ])
+
+    def test_image_is_normalized(self):
+        '''Копии повёрнуты, уменьшены и очищены от EXIF'''
+        images.process_image(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (500, 1000)
+        )
+        name = images.rendition_name(self.post.image.name, 500, 'jpeg')
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (500, 1000))
+            self.assertNotIn(0x0112, image.getexif())
+
+    def test_original_is_kept_intact(self):
+        '''Оригинал не пересжимается, копии сохраняют профиль ICC'''
+        # Профиль сохраняется как есть, его содержимое не разбирается
+        icc_profile = b'profile' * 20
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 200), 'red').save(
+            buffer, 'JPEG', icc_profile=icc_profile
+        )
+        post = Post.objects.create(
+            author=self.user,
+            text='С профилем',
+            image=SimpleUploadedFile('icc.jpg', buffer.getvalue()),
+        )
+        name = post.image.name
+        for _ in range(2):
+            images.process_image(name)
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), buffer.getvalue())
+        with default_storage.open(
+            images.rendition_name(name, 300, 'jpeg')
+        ) as file:
+            self.assertEqual(
+                Image.open(file).info.get('icc_profile'), icc_profile
+            )
+
+    def test_renditions_and_srcset(self):
+        '''Копии всех ширин попадают в srcset вместе с размерами'''
+        name = self.post.image.name
+        images.process_image(name)
+        for width in (200, 400, 500):
+            with self.subTest(width=width):
+                self.assertTrue(default_storage.exists(
+                    images.rendition_name(name, width, 'jpeg')
+                ))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        content = response.content.decode()
+        self.assertIn('400w', content)
+        self.assertIn('width="500"', content)
+        self.assertIn('height="1000"', content)
+
+    def test_placeholder_and_lazy_loading(self):
+        '''В ленте картинка грузится лениво поверх заглушки'''
+        images.process_image(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_color, '#fe0000')
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(self.post.image_placeholder), 1024)
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('loading="lazy"', content)
+        self.assertIn(self.post.image_placeholder, content)
+        content = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).content.decode()
+        self.assertNotIn('loading="lazy"', content)
+
+    def test_delete_renditions(self):
+        name = self.post.image.name
+        images.process_image(name)
+        images.delete_renditions(name)
+        self.assertFalse(default_storage.exists(
+            images.rendition_name(name, 200, 'jpeg')
+        ))
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_RENDITION_WIDTHS=(200,),
+    IMAGE_RENDITION_FORMATS=('jpeg',),
+)
+class RegenerateThumbnailsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.in_group = Post.objects.create(
+            author=self.user, text='В группе', group=self.group,
+            image=photo(300, 300),
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Без группы', image=photo(301, 300)
+        )
+
+    def regenerate(self, *args):
+        out = StringIO()
+        call_command(
+            'regenerate_thumbnails', '--processes=1', *args, stdout=out,
+            stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_filters_and_skips_up_to_date(self):
+        '''Обрабатываются только отобранные и устаревшие картинки'''
+        output = self.regenerate('--group=group')
+        self.assertIn('Обработано картинок: 1, пропущено: 0', output)
+        self.in_group.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.in_group.image_width, 300)
+        self.assertIsNone(self.other.image_width)
+        self.assertTrue(thumbnails.exists(self.in_group.image.name))
+        self.assertIn('Обработано картинок: 1, пропущено: 1',
+                      self.regenerate())
+        self.assertIn('Обработано картинок: 2, пропущено: 0',
+                      self.regenerate('--force'))
+
+    def test_date_filters_are_timezone_aware(self):
+        '''Даты --since и --until не вызывают предупреждений о поясе'''
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            output = self.regenerate(
+                '--since=2000-01-01', '--until=2999-01-01'
+            )
+        self.assertIn('Обработано картинок: 2', output)
@@ -0,0 +1,89 @@
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from core import pubsub
+from core.models import Notification
+from posts import live
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class LiveEventsTests(TestCase):
+    def setUp(self):
+        self.hub = pubsub.Hub()
+        patcher = mock.patch.object(pubsub, 'hub', self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Транзакция теста не фиксируется: сообщения пишутся сразу
+        patcher = mock.patch.object(
+            pubsub.transaction, 'on_commit',
+            lambda func, using=None: func(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Опрос базы в фоновом потоке тестам не нужен
+        patcher = mock.patch.object(self.hub, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+
+    def read(self, response, count):
+        chunks = iter(response.streaming_content)
+        events = [next(chunks).decode() for _ in range(count)]
+        response.close()
+        return events
+
+    def test_new_posts_are_published(self):
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        notification = Notification.objects.get()
+        self.assertEqual(notification.channel, live.author_channel(
+            self.author.pk
+        ))
+        data = json.loads(notification.payload)
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(
+            data['url'], reverse('posts:post_detail', args=[post.pk])
+        )
+
+    def test_follow_stream_replays_followed_authors(self):
+        '''Поток ленты отдаёт посты только отслеживаемых авторов'''
+        Post.objects.create(author=self.other, text='Чужой')
+        post = Post.objects.create(author=self.author, text='Свой')
+        response = self.client.get(
+            reverse('posts:follow_events'), HTTP_LAST_EVENT_ID='0'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        retry, event = self.read(response, 2)
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn('event: post', event)
+        self.assertIn(f'"id": {post.pk}', event)
+        self.assertEqual(dict(self.hub._channels), {})
+
+    def test_comment_stream_receives_new_comments(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        response = self.client.get(
+            reverse('posts:comment_events', args=[post.pk])
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        self.hub.poll()
+        _, event = self.read(response, 2)
+        self.assertIn(f'id: {Notification.objects.last().pk}', event)
+        self.assertIn(f'"id": {comment.pk}', event)
+
+    def test_follow_stream_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('posts:follow_events'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
@@ -0,0 +1,145 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Task
+from posts import resize
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_CACHE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def photo(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'blue').save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    RESIZE_CACHE_ROOT=TEMP_CACHE_ROOT,
+    POST_THUMBNAIL_GEOMETRY='120x60',
+)
+class ResizeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', image=photo(400, 300)
+        )
+        cls.name = cls.post.image.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+        resize._cache_size = None
+        # Ленту, закешированную другими тестами, не используем
+        cache.clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        content = b''.join(response.streaming_content)
+        response.close()
+        return response, content
+
+    def test_signed_url_is_resized_and_cached(self):
+        '''Картинка уменьшается один раз, повтор читается с диска'''
+        url = resize.resize_url(self.name, 120, 60, crop=True)
+        response, content = self.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(io.BytesIO(content)).size, (120, 60))
+        with mock.patch('posts.resize.render') as render:
+            response, cached = self.get(url)
+        render.assert_not_called()
+        self.assertEqual(cached, content)
+
+    def test_bad_signature_and_spec(self):
+        spec = resize.make_spec(120, 60)
+        for url in (
+            reverse('resize', args=[spec, 'wrong', self.name]),
+            reverse('resize', args=[
+                '9999x1', resize.sign('9999x1', self.name), self.name
+            ]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_busy_pool_is_rejected(self):
+        url = resize.resize_url(self.name, 100, 100)
+        _, slots = resize._pool()
+        with mock.patch.object(slots, 'acquire', return_value=False):
+            response = self.client.get(url)
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE
+        )
+
+    def test_lru_eviction_by_size(self):
+        '''При переполнении удаляются давно не запрошенные файлы'''
+        old = resize.get('100x100', self.name)[0]
+        new = resize.get('200x200', self.name)[0]
+        os.utime(old, (0, os.path.getmtime(old)))
+        resize.evict(os.path.getsize(new))
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+    def test_cache_hit_keeps_etag(self):
+        '''Повторный запрос с ETag из кеша получает 304'''
+        url = resize.resize_url(self.name, 100, 100)
+        self.get(url)
+        os.utime(resize.cache_path('100x100', self.name), (1, 1))
+        etag = self.get(url)[0]['ETag']
+        self.assertEqual(self.get(url)[0]['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_cold_thumbnail_uses_resize_url(self):
+        '''Без миниатюры страница ссылается на уменьшение, не пишет в базу'''
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, resize.thumbnail_url(self.name))
+        self.assertContains(response, 'width="120" height="60"')
+        self.assertFalse(Task.objects.exists())
+
+    def test_broken_image_and_timeout(self):
+        '''Не картинка - 404, долгое уменьшение - 503'''
+        broken = Post.objects.create(
+            author=self.user,
+            text='Битая',
+            image=SimpleUploadedFile('broken.jpg', b'not an image'),
+        )
+        response = self.client.get(
+            resize.resize_url(broken.image.name, 100, 100)
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        with override_settings(RESIZE_TIMEOUT=0), mock.patch(
+            'posts.resize.render',
+            side_effect=lambda *args: time.sleep(0.2),
+        ):
+            response = self.client.get(
+                resize.resize_url(self.name, 90, 90)
+            )
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE
+        )
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import sitemaps
+from posts.models import Post, SitemapChunk
+
+User = get_user_model()
+
+TEMP_SITEMAP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SITEMAP_ROOT=TEMP_SITEMAP_ROOT, SITEMAP_CHUNK_SIZE=2)
+class SitemapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_SITEMAP_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.posts = [
+            Post.objects.create(author=self.user, text=f'Пост {num}')
+            for num in range(3)
+        ]
+        self.first_chunk = sitemaps.chunk_number(self.posts[0].pk)
+
+    def read(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_build_splits_posts_into_chunks(self):
+        '''Посты раскладываются по частям по диапазонам id'''
+        sitemaps.build(full=True)
+        index = self.read(reverse('sitemap'))
+        chunks = SitemapChunk.objects.filter(urls__gt=0)
+        self.assertEqual(sum(chunk.urls for chunk in chunks), 3)
+        for chunk in chunks:
+            self.assertIn(f'sitemap-{chunk.number}.xml', index)
+        content = self.read(
+            reverse('sitemap_chunk', args=[self.first_chunk])
+        )
+        self.assertIn(
+            reverse('posts:post_detail', args=[self.posts[0].pk]), content
+        )
+        self.assertIn(self.posts[0].updated.isoformat(), content)
+
+    def test_only_changed_chunks_rebuilt(self):
+        '''Повторная сборка трогает только изменившиеся части'''
+        sitemaps.build(full=True)
+        self.assertEqual(sitemaps.build(), [])
+        self.posts[0].delete()
+        self.assertEqual(sitemaps.build(), [self.first_chunk])
+
+    def test_edit_updates_lastmod(self):
+        '''Правка поста перегенерирует часть с новой датой изменения'''
+        sitemaps.build(full=True)
+        post = self.posts[0]
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(sitemaps.build(), [self.first_chunk])
+        content = self.read(
+            reverse('sitemap_chunk', args=[self.first_chunk])
+        )
+        self.assertIn(post.updated.isoformat(), content)
+
+    def test_empty_chunk_is_not_written(self):
+        sitemaps.build(full=True)
+        for post in self.posts:
+            post.delete()
+        sitemaps.build()
+        self.assertFalse(
+            os.path.exists(sitemaps.chunk_path(self.first_chunk))
+        )
+
+    def test_missing_chunk_is_404(self):
+        '''Несгенерированная часть отдаёт 404'''
+        response = self.client.get(reverse('sitemap_chunk', args=[999]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
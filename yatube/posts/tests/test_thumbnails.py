@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PreloadedThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for num in range(3):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {num}',
+                image=SimpleUploadedFile(
+                    f'small{num}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_page_resolves_thumbnails_in_one_query(self):
+        '''Метаданные миниатюр страницы читаются одним запросом'''
+        self.client.get(reverse('posts:index'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(response.content.decode().count('card-img'), 3)
+
+    def test_preload_matches_sorl(self):
+        '''Карта preload() совпадает с миниатюрами sorl'''
+        posts = list(Post.objects.all())
+        expected = {
+            post.image.name: thumbnails.get_thumbnail(post.image).name
+            for post in posts
+        }
+        preloaded = thumbnails.preload(posts)
+        self.assertEqual(
+            {name: image.name for name, image in preloaded.items()},
+            expected,
+        )
+
+    def test_warmed_thumbnail_is_preloaded(self):
+        '''Миниатюра, созданная по имени файла, видна preload()'''
+        post = Post.objects.first()
+        self.assertEqual(
+            thumbnails.thumbnail_key(post.image.name),
+            thumbnails.thumbnail_key(post.image),
+        )
+        thumbnails.warm(post.image.name)
+        self.assertTrue(thumbnails.exists(post.image.name))
+        self.assertIn(post.image.name, thumbnails.preload([post]))
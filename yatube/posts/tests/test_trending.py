@@ -0,0 +1,65 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Post, TrendingScore
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=3600, TRENDING_MIN_SCORE=0.01)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.old_post = Post.objects.create(author=cls.user, text='Старый')
+        cls.new_post = Post.objects.create(author=cls.user, text='Новый')
+
+    def test_post_and_comment_update_score(self):
+        '''Создание поста и комментария увеличивает рейтинг'''
+        score = TrendingScore.objects.get(post=self.old_post).score
+        Comment.objects.create(
+            post=self.old_post, author=self.user, text='Комментарий'
+        )
+        new_score = TrendingScore.objects.get(post=self.old_post).score
+        self.assertGreater(new_score, score)
+        self.assertEqual(trending.top()[0], self.old_post)
+
+    def test_old_events_decay(self):
+        '''Давние события весят меньше свежих'''
+        now = timezone.now()
+        TrendingScore.objects.all().delete()
+        trending.bump(self.old_post.pk, 3, now - timedelta(hours=3))
+        trending.bump(self.new_post.pk, 1, now)
+        self.assertEqual(trending.top(), [self.new_post, self.old_post])
+        score = TrendingScore.objects.get(post=self.old_post).score
+        self.assertAlmostEqual(trending.decayed(score, now), 3 / 8)
+
+    def test_compact_drops_decayed(self):
+        '''compact_trending удаляет затухшие записи'''
+        TrendingScore.objects.all().delete()
+        trending.bump(
+            self.old_post.pk, 1, timezone.now() - timedelta(hours=10)
+        )
+        trending.bump(self.new_post.pk)
+        call_command('compact_trending', stdout=StringIO())
+        self.assertQuerysetEqual(
+            TrendingScore.objects.values_list('post', flat=True),
+            [self.new_post.pk],
+            transform=int
+        )
+
+    def test_trending_page(self):
+        '''Страница популярного доступна и читает рейтинг одним запросом'''
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, self.new_post.text)
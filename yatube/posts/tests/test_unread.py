@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import unread
+from posts.models import FeedMarker, Follow, Post
+
+User = get_user_model()
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+
+    def unread(self):
+        response = self.client.get(reverse('posts:follow_unread'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()['count']
+
+    def test_counts_followed_authors_since_last_visit(self):
+        '''Считаются только новые посты отслеживаемых авторов'''
+        Post.objects.create(author=self.author, text='Первый')
+        Post.objects.create(author=self.other, text='Чужой')
+        self.assertEqual(self.unread(), 1)
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(self.unread(), 0)
+        Post.objects.create(author=self.author, text='Второй')
+        self.assertEqual(self.unread(), 1)
+
+    def test_nothing_new_needs_no_queries(self):
+        '''Без новых постов счётчик берётся из кеша'''
+        Post.objects.create(author=self.author, text='Пост')
+        unread.mark_seen(self.user)
+        unread.count(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.count(self.user), 0)
+
+    def test_cached_count_follows_new_posts(self):
+        Post.objects.create(author=self.author, text='Первый')
+        self.assertEqual(unread.count(self.user), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.count(self.user), 1)
+        post = Post.objects.create(author=self.author, text='Второй')
+        self.assertEqual(unread.count(self.user), 2)
+        post.delete()
+        self.assertEqual(unread.count(self.user), 1)
+
+    def test_marker_and_new_label(self):
+        '''Лента помечает посты новее прошлого визита'''
+        Post.objects.create(author=self.author, text='Старый')
+        self.client.get(reverse('posts:follow_index'))
+        new = Post.objects.create(author=self.author, text='Свежий')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['last_seen'], new.pk - 1)
+        self.assertContains(response, 'Новое', count=1)
+        self.assertEqual(
+            FeedMarker.objects.get(user=self.user).last_seen_id, new.pk
+        )
+
+    @override_settings(UNREAD_MAX_COUNT=2)
+    def test_header_badge(self):
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '2+</span>')
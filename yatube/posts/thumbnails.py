@@ -0,0 +1,124 @@
+# posts/thumbnails.py
+"""Миниатюры sorl-thumbnail для страниц ленты.
+
+Тег {% thumbnail %} ищет метаданные каждой миниатюры в хранилище
+ключей sorl отдельно: запрос к кешу и, при промахе, к таблице
+thumbnail_kvstore на каждый пост страницы. preload() вычисляет
+ключи миниатюр всей страницы и читает их одним get_many и одним
+запросом IN. Найденные миниатюры берутся из этой карты; вместо
+остальных страница ссылается на posts.resize, а sorl создаёт их
+в фоновой очереди.
+"""
+import logging
+
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import images
+
+logger = logging.getLogger(__name__)
+
+
+def source(file_):
+    """Картинка поста для sorl: файл поля или имя в хранилище постов.
+
+    Ключ sorl зависит от класса хранилища, поэтому голое имя нельзя
+    передавать sorl напрямую: оно попало бы в default_storage.
+    """
+    if isinstance(file_, str):
+        return ImageFile(file_, images.storage())
+    return ImageFile(file_)
+
+
+def _options(source):
+    """Параметры миниатюры так же, как их дополняет get_thumbnail."""
+    backend = default.backend
+    options = dict(settings.POST_THUMBNAIL_OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_key(file_):
+    """Ключ хранилища sorl для миниатюры картинки поста."""
+    image = source(file_)
+    name = default.backend._get_thumbnail_filename(
+        image, settings.POST_THUMBNAIL_GEOMETRY, _options(image)
+    )
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _load(keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(loaded)
+    return {
+        key: value for key, value in values.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+def preload(posts):
+    """Миниатюры картинок постов, уже известные sorl: {имя: ImageFile}."""
+    keys = {
+        thumbnail_key(post.image): post.image.name
+        for post in posts if post.image
+    }
+    if not keys:
+        return {}
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in _load(list(keys)).items()
+    }
+
+
+def get_thumbnail(file_):
+    """Миниатюра картинки через sorl; None при ошибке."""
+    try:
+        return default.backend.get_thumbnail(
+            source(file_), settings.POST_THUMBNAIL_GEOMETRY,
+            **settings.POST_THUMBNAIL_OPTIONS
+        )
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось получить миниатюру %s', file_)
+        return None
+
+
+def exists(name):
+    """Миниатюра картинки уже создана и известна sorl."""
+    values = _load([thumbnail_key(name)])
+    if not values:
+        return False
+    return deserialize_image_file(next(iter(values.values()))).exists()
+
+
+def warm(name):
+    """Задача очереди: создаёт миниатюру, которой ещё нет у sorl."""
+    get_thumbnail(name)
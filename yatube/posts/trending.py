@@ -0,0 +1,72 @@
+# posts/trending.py
+import math
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+from .models import TrendingScore
+
+# Точка отсчёта времени для логарифмического рейтинга
+EPOCH = 1577836800  # 2020-01-01 00:00:00 UTC
+
+
+def _tau():
+    return settings.TRENDING_HALF_LIFE / math.log(2)
+
+
+def log_weight(weight, moment=None):
+    """Вклад события веса weight в момент moment в логарифмической шкале."""
+    moment = moment or timezone.now()
+    return math.log(weight) + (moment.timestamp() - EPOCH) / _tau()
+
+
+def decayed(score, moment=None):
+    """Текущее значение рейтинга с учётом затухания."""
+    moment = moment or timezone.now()
+    return math.exp(score - log_weight(1, moment))
+
+
+def bump(post_id, weight=1, moment=None):
+    """Добавляет событие к рейтингу поста одним UPDATE.
+
+    score = logaddexp(score, x) считается на стороне базы,
+    поэтому параллельные обновления не теряются.
+    """
+    value = Value(log_weight(weight, moment))
+    high = Greatest(F('score'), value)
+    low = Least(F('score'), value)
+    expression = high + Ln(Value(1.0) + Exp(low - high))
+    updated = TrendingScore.objects.filter(post_id=post_id).update(
+        score=expression,
+        updated=timezone.now(),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(
+                post_id=post_id,
+                score=value.value,
+            )
+    except IntegrityError:
+        # Запись успел создать параллельный запрос
+        bump(post_id, weight, moment)
+
+
+def top(limit=None):
+    """Самые популярные посты: одно чтение по индексу score."""
+    limit = limit or settings.TRENDING_SIZE
+    scores = TrendingScore.objects.select_related(
+        'post__author', 'post__group'
+    ).order_by('-score')[:limit]
+    return [item.post for item in scores]
+
+
+def compact(moment=None):
+    """Удаляет записи, рейтинг которых затух ниже TRENDING_MIN_SCORE."""
+    threshold = log_weight(settings.TRENDING_MIN_SCORE, moment)
+    deleted, _ = TrendingScore.objects.filter(score__lt=threshold).delete()
+    return deleted
@@ -0,0 +1,128 @@
+# posts/unread.py
+"""Счётчик непрочитанных постов ленты подписок.
+
+У пользователя хранится id последнего просмотренного поста ленты
+(FeedMarker). В кеше лежат id последнего поста каждого автора:
+публикация обновляет один ключ автора, а не ключи всех
+подписчиков. Если ни у одного отслеживаемого автора нет поста
+новее отметки, счётчик равен нулю без запросов к базе. Иначе
+посты считаются запросом по индексу (author, id), не более
+UNREAD_MAX_COUNT, и число кешируется до следующей публикации
+или смены отметки. Список авторов подписок тоже кешируется, так что
+значок в шапке обычно не требует запросов к базе.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import FeedMarker, Follow, Post
+
+
+def _author_key(author_id):
+    return f'unread:author:{author_id}'
+
+
+def _seen_key(user_id):
+    return f'unread:seen:{user_id}'
+
+
+def _follows_key(user_id):
+    return f'unread:follows:{user_id}'
+
+
+def _count_key(user_id):
+    return f'unread:count:{user_id}'
+
+
+def record_post(post):
+    """Запоминает новый пост автора."""
+    cache.set(_author_key(post.author_id), post.pk, None)
+
+
+def forget_author(author_id):
+    """Последний пост автора пересчитается при следующем обращении."""
+    cache.delete(_author_key(author_id))
+
+
+def latest_posts(author_ids):
+    """{id автора: id его последнего поста или 0}."""
+    keys = {_author_key(author_id): author_id for author_id in author_ids}
+    cached = cache.get_many(keys)
+    latest = {keys[key]: value for key, value in cached.items()}
+    missing = [author_id for author_id in author_ids
+               if author_id not in latest]
+    if missing:
+        found = dict(
+            Post.objects.filter(author_id__in=missing).order_by()
+            .values('author_id').annotate(last=Max('pk'))
+            .values_list('author_id', 'last')
+        )
+        loaded = {author_id: found.get(author_id, 0)
+                  for author_id in missing}
+        cache.set_many(
+            {_author_key(author_id): last
+             for author_id, last in loaded.items()},
+            None,
+        )
+        latest.update(loaded)
+    return latest
+
+
+def followed_authors(user):
+    authors = cache.get(_follows_key(user.pk))
+    if authors is None:
+        authors = list(Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ))
+        cache.set(_follows_key(user.pk), authors, None)
+    return authors
+
+
+def forget_follows(user_id):
+    cache.delete(_follows_key(user_id))
+
+
+def last_seen(user):
+    seen = cache.get(_seen_key(user.pk))
+    if seen is None:
+        seen = FeedMarker.objects.filter(user=user).values_list(
+            'last_seen_id', flat=True
+        ).first() or 0
+        cache.set(_seen_key(user.pk), seen, None)
+    return seen
+
+
+def count(user):
+    """Число непрочитанных постов подписок, не больше UNREAD_MAX_COUNT."""
+    latest = latest_posts(followed_authors(user))
+    seen = last_seen(user)
+    if max(latest.values(), default=0) <= seen:
+        return 0
+    # Число верно, пока не изменились отметка и последние посты
+    stamp = (seen, sorted(latest.items()))
+    cached = cache.get(_count_key(user.pk))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    unread = len(
+        Post.objects.filter(
+            author_id__in=list(latest), pk__gt=seen
+        ).order_by().values_list('pk', flat=True)[
+            :settings.UNREAD_MAX_COUNT
+        ]
+    )
+    cache.set(_count_key(user.pk), (stamp, unread), None)
+    return unread
+
+
+def mark_seen(user):
+    """Отмечает ленту прочитанной; возвращает прежнюю отметку."""
+    seen = last_seen(user)
+    newest = max(
+        latest_posts(followed_authors(user)).values(), default=0
+    )
+    if newest > seen:
+        FeedMarker.objects.update_or_create(
+            user=user, defaults={'last_seen_id': newest}
+        )
+        cache.set(_seen_key(user.pk), newest, None)
+    return seen
@@ -7,6 +7,10 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    # Популярные посты
+    path('trending/', views.trending, name='trending'),
+    # Каталог сообществ
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
@@ -22,8 +26,16 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    # Новые комментарии к записи (Server-Sent Events)
+    path(
+        'posts/<int:post_id>/comments/events/',
+        views.comment_events,
+        name='comment_events'
+    ),
     # Система подписок
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/events/', views.follow_events, name='follow_events'),
+    path('follow/unread/', views.follow_unread, name='follow_unread'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
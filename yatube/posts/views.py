@@ -1,22 +1,30 @@
 # posts/views.py
+import os
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core import media, pubsub
+from core.lookups import get_cached_or_404
+from core.paginator import CachedCountPaginator
+
+from . import archive, live, resize, sitemaps, unread
+from . import trending as trending_posts
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
 
 
 def paginate(request, post_list):
-    paginator = Paginator(post_list, settings.COUNT_POSTS)
+    paginator = CachedCountPaginator(post_list, settings.COUNT_POSTS)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.cached.all()
     page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -24,9 +32,25 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+def trending(request):
+    context = {
+        'posts': trending_posts.top(),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_index(request):
+    group_list = Group.cached.order_by('title')
+    page_obj = paginate(request, group_list)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = get_cached_or_404(Group, 'slug', slug)
+    post_list = Post.cached.filter(group=group)
     page_obj = paginate(request, post_list)
     context = {
         'group': group,
@@ -36,10 +60,10 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = get_cached_or_404(User, 'username', username)
+    post_list = archive.author_posts(author)
     page_obj = paginate(request, post_list)
-    number_of_posts = post_list.count()
+    number_of_posts = page_obj.paginator.count
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -53,15 +77,17 @@ def profile(request, username):
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = archive.get_post_or_404(post_id)
     form = PostForm()
     commets_form = CommentForm()
-    comments = post.comments.all()
+    comments = archive.post_comments(post)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
         'commets_form': commets_form,
+        # Архивный пост нельзя комментировать
+        'archived': archive.is_archived(post),
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -111,20 +137,47 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
+    post_list = Post.cached.filter(
         author__following__user=request.user
     )
     page_obj = paginate(request, post_list)
+    # Посты новее прежней отметки помечаются как новые
+    last_seen = unread.last_seen(request.user)
+    if page_obj.number == 1:
+        last_seen = unread.mark_seen(request.user)
     context = {
         "page_obj": page_obj,
+        "last_seen": last_seen,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def follow_unread(request):
+    # Число непрочитанных постов подписок для значка в шапке
+    response = JsonResponse({'count': unread.count(request.user)})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def follow_events(request):
+    # Поток новых постов авторов, на которых подписан пользователь
+    return pubsub.stream(request, live.follow_channels(request.user), 'post')
+
+
+def comment_events(request, post_id):
+    # Поток новых комментариев к посту
+    post = get_object_or_404(Post, pk=post_id)
+    return pubsub.stream(
+        request, [live.comments_channel(post.pk)], 'comment'
+    )
+
+
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(User, 'username', username)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
@@ -133,6 +186,42 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(User, 'username', username)
     Follow.objects.filter(user=request.user).filter(author=author).delete()
     return redirect('posts:profile', username)
+
+
+def _sitemap_response(path):
+    if not os.path.exists(path):
+        raise Http404('Карта сайта ещё не сгенерирована')
+    return FileResponse(open(path, 'rb'), content_type='application/xml')
+
+
+def sitemap_index(request):
+    return _sitemap_response(sitemaps.index_path())
+
+
+def sitemap_chunk(request, number):
+    return _sitemap_response(sitemaps.chunk_path(number))
+
+
+def resize_image(request, spec, signature, name):
+    # Уменьшенная картинка поста по подписанной ссылке
+    if not resize.check_signature(spec, name, signature):
+        raise Http404('Неверная подпись')
+    try:
+        path, content_type = resize.get(spec, name)
+    except ValueError:
+        raise Http404('Неверный размер')
+    except resize.Unreadable:
+        raise Http404('Картинка не найдена')
+    except resize.Busy:
+        response = HttpResponse('Сервер перегружен', status=503)
+        response['Retry-After'] = '1'
+        return response
+    return media.serve_file(
+        request,
+        path,
+        content_type=content_type,
+        cache_control=f'public, max-age={settings.RESIZE_MAX_AGE}',
+    )
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.GZipCachedMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -45,18 +47,28 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Загрузчики минифицируют HTML шаблонов (см. core.loaders)
+TEMPLATE_LOADERS = [
+    'core.loaders.FilesystemLoader',
+    'core.loaders.AppDirectoriesLoader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.unread_count',
             ],
         },
     },
@@ -72,9 +84,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Архив старых постов и комментариев (см. posts.archive)
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'archive.sqlite3'),
+    },
 }
 
+DATABASE_ROUTERS = ['posts.routers.ArchiveRouter']
+
+
+# Сессии и request.user читаются из кеша, а не из базы на каждом запросе
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['core.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -115,12 +140,25 @@ USE_TZ = True
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# collectstatic добавляет хеш в имена файлов и сохраняет сжатые копии,
+# которые отдаёт core.middleware.StaticFilesMiddleware. При разработке
+# collectstatic не запускают, и манифеста нет
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATIC_COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.map', '.ico')
+STATIC_GZIP_LEVEL = 9
+# Время кеширования в браузере файлов без хеша в имени (в секундах)
+STATIC_MAX_AGE = 60 * 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма отправляет фоновая очередь через TASK_EMAIL_BACKEND
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+TASK_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 COUNT_POSTS = 10
@@ -133,8 +171,181 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдача загруженных файлов (core.media): None - сам Django,
+# 'nginx' - X-Accel-Redirect во внутренний location
+# MEDIA_ACCEL_PREFIX (alias на MEDIA_ROOT), 'sendfile' - X-Sendfile
+MEDIA_SERVE_BACKEND = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Каталоги MEDIA_ROOT, файлы из которых доступны по MEDIA_URL
+MEDIA_SERVE_DIRS = ('posts', 'cache')
+# Функции (имя файла -> bool), которые могут запретить отдачу файла
+MEDIA_SERVE_CHECKS = ('posts.dedup.is_referenced',)
+# Файлы с именем по хешу содержимого кешируются навсегда
+MEDIA_MAX_AGE = 24 * 60 * 60
+MEDIA_BLOCK_SIZE = 64 * 1024
+
+# Локальный LRU процесса перед общим кешем (core.cache_backends):
+# LOCAL_TIMEOUT - сколько живёт локальная запись, CHECK_INTERVAL -
+# как часто сверяется счётчик версий в общем кеше, NAMESPACES -
+# префиксы ключей с отдельным счётчиком (остальные ключи делят один)
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 500,
+            'LOCAL_TIMEOUT': 5,
+            'CHECK_INTERVAL': 0.5,
+            'NAMESPACES': (
+                'unread', 'querycache', 'count', 'count_generation',
+                'estimated_count', 'lookup', 'groups', 'gzip',
+            ),
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
+}
+
+# Популярные посты: период полураспада рейтинга (в секундах),
+# веса событий, размер выдачи и порог для compact_trending
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_POST_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 1
+TRENDING_SIZE = 50
+TRENDING_MIN_SCORE = 0.01
+
+# Карта сайта: каталог с файлами, размер части и адрес сайта
+# (он же - основа ссылок в письмах)
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+SITEMAP_CHUNK_SIZE = 50000
+SITEMAP_BASE_URL = 'http://localhost:8000'
+
+# Архив: возраст постов для переноса (в днях) и размер порции
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Фоновая очередь задач (core.tasks, manage.py run_worker).
+# TASK_QUEUE_EAGER = True выполняет задачи сразу при постановке.
+TASK_QUEUE_EAGER = False
+TASK_QUEUE_THREADS = 4
+TASK_QUEUE_POLL_INTERVAL = 1
+TASK_QUEUE_MAX_ATTEMPTS = 5
+TASK_QUEUE_RETRY_DELAY = 10
+TASK_QUEUE_MAX_RETRY_DELAY = 60 * 60
+TASK_QUEUE_LOCK_TIMEOUT = 10 * 60
+# Сколько хранятся выполненные и упавшие задачи и как часто
+# обработчик удаляет старые (порциями по TASK_QUEUE_PRUNE_BATCH_SIZE)
+TASK_QUEUE_DONE_RETENTION = 24 * 60 * 60
+TASK_QUEUE_FAILED_RETENTION = 7 * 24 * 60 * 60
+TASK_QUEUE_PRUNE_INTERVAL = 10 * 60
+TASK_QUEUE_PRUNE_BATCH_SIZE = 1000
+
+# Сообщения для Server-Sent Events (core.pubsub): как часто поток
+# процесса читает таблицу сообщений, сколько они хранятся для
+# переподключившихся клиентов и как часто удаляются старые
+PUBSUB_POLL_INTERVAL = 1
+PUBSUB_BATCH_SIZE = 500
+PUBSUB_RETENTION = 60 * 60
+PUBSUB_PRUNE_INTERVAL = 5 * 60
+PUBSUB_QUEUE_SIZE = 100
+# Строки с меньшим номером могут зафиксироваться позже: столько
+# номеров за последним прочитанным опрос просматривает повторно
+PUBSUB_LOOKBACK = 100
+# Поток событий занимает процесс сервера, поэтому ограничен по
+# времени; браузер переподключается через SSE_RETRY мс
+SSE_HEARTBEAT = 15
+SSE_MAX_DURATION = 5 * 60
+SSE_RETRY = 5000
+# Длина текста поста в событии ленты подписок (posts.live)
+LIVE_SUMMARY_LENGTH = 200
+
+# Значок непрочитанных постов подписок (posts.unread) считает
+# не больше UNREAD_MAX_COUNT постов; если их столько, показывает «99+»
+UNREAD_MAX_COUNT = 99
+
+# Дайджесты для подписчиков: получателей за прогон, писем в пачке
+# и событий в одном окне рассылки
+DIGEST_MAX_PER_RUN = 5000
+DIGEST_BATCH_SIZE = 100
+DIGEST_MAX_EVENTS = 10000
+
+# Фоновое удаление по частям: размер порции и пауза между порциями
+DELETION_BATCH_SIZE = 500
+DELETION_BATCH_PAUSE = 0.05
+# После стольких неудачных запусков задание помечается ошибкой
+DELETION_MAX_ATTEMPTS = 5
+
+# Время жизни оценки размера таблиц для постраничной навигации (в секундах)
+ESTIMATED_COUNT_TIMEOUT = 60
+# Через сколько секунд кешированный размер выборки пересчитывается в фоне
+COUNT_CACHE_TIMEOUT = 5 * 60
+# Модели постраничных выборок: их сохранение и удаление
+# сбрасывает кешированные размеры выборок с их таблицами
+COUNT_CACHE_MODELS = ('posts.Post', 'posts.Follow', 'posts.Group')
+# Навигация: соседних страниц с каждой стороны и страниц в начале и конце
+PAGINATOR_ON_EACH_SIDE = 2
+PAGINATOR_ON_ENDS = 1
+
+# Минификация шаблонов и сжатие HTML-ответов
+HTML_MINIFY = True
+HTML_MINIFY_EXCLUDE = ('admin/', 'registration/')
+HTML_GZIP_LEVEL = 6
+HTML_GZIP_MIN_LENGTH = 200
+HTML_GZIP_CACHE_TIMEOUT = 60
+
+# Кеш поиска групп по slug и пользователей по username (в секундах);
+# отсутствующие объекты кешируются на меньшее время
+LOOKUP_CACHE_TIMEOUT = 60 * 60
+LOOKUP_CACHE_MISSING_TIMEOUT = 5 * 60
+
+# Защита от одновременного пересчёта кеша (core.cache.get_or_compute):
+# сколько отдавать устаревшее значение, время жизни блокировки,
+# ожидание чужого пересчёта и коэффициент раннего пересчёта
+CACHE_STALE_TIMEOUT = 5 * 60
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_EARLY_BETA = 1.0
+
+# Кеширование выборок менеджерами cached (core.querycache):
+# время жизни по умолчанию и для отдельных моделей; внутри
+# транзакции кеш по умолчанию не используется
+QUERY_CACHE_TIMEOUT = 60
+QUERY_CACHE_TIMEOUTS = {
+    'posts.Group': 10 * 60,
+    'posts.Follow': 10 * 60,
 }
+QUERY_CACHE_IN_ATOMIC = False
+
+# Обработка загруженных картинок (posts.images): наибольшая сторона
+# оригинала, ширины и форматы копий для srcset, качество сжатия
+IMAGE_MAX_SIZE = 2560
+IMAGE_RENDITION_WIDTHS = (480, 960, 1920)
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_DIR = 'posts/renditions'
+IMAGE_QUALITY = 82
+IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+# Заглушка на время ленивой загрузки: ширина крошечной копии
+# (около полукилобайта в data URI) и её качество
+IMAGE_PLACEHOLDER_SIZE = 16
+IMAGE_PLACEHOLDER_QUALITY = 50
+# Сборка мусора не удаляет файл, загруженный позже чем столько секунд
+# назад: пост со ссылкой на него может быть ещё не сохранён
+IMAGE_GC_GRACE = 10 * 60
+
+# Миниатюра sorl-thumbnail для картинок, ещё не обработанных
+# posts.images (posts.thumbnails)
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Уменьшение картинок по подписанной ссылке (posts.resize):
+# пул потоков, очередь, дисковый кеш и его предельный размер
+RESIZE_THREADS = 4
+RESIZE_QUEUE_SIZE = 16
+RESIZE_TIMEOUT = 30
+RESIZE_MAX_SIZE = 2560
+RESIZE_CACHE_ROOT = os.path.join(BASE_DIR, 'resize_cache')
+RESIZE_CACHE_MAX_SIZE = 512 * 1024 * 1024
+RESIZE_MAX_AGE = 30 * 24 * 60 * 60
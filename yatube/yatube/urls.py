@@ -3,7 +3,9 @@
 from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core import media
+from posts import views as posts_views
 
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
@@ -11,13 +13,28 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
+    # Карта сайта, заранее сгенерированная командой build_sitemaps
+    path('sitemap.xml', posts_views.sitemap_index, name='sitemap'),
+    path(
+        'sitemap-<int:number>.xml',
+        posts_views.sitemap_chunk,
+        name='sitemap_chunk'
+    ),
+    # Уменьшение картинок постов по подписанной ссылке
+    path(
+        'resize/<str:spec>/<str:signature>/<path:name>',
+        posts_views.resize_image,
+        name='resize'
+    ),
+    # Загруженные файлы: nginx отдаёт их по X-Accel-Redirect,
+    # без него - сам Django с поддержкой Range и ETag
+    path(
+        settings.MEDIA_URL.lstrip('/') + '<path:path>',
+        media.serve,
+        name='media'
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.csrf_failure'
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )